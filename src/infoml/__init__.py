@@ -29,6 +29,18 @@ class config:
     tempdir : pathlib.PosixPath
         Path to the temporary directory. This will be the default location for
         storing temporary files.
+    chunksize : int
+        Number of bytes read per chunk when streaming downloads. A value of 0
+        lets the chunk size be chosen from the size of each download.
+    ttl : float
+        Number of seconds a downloaded file is used before it is revalidated
+        against the server.
+    cachesize : int
+        Disk budget of the cache directory in bytes. The least recently used
+        entries are evicted when it is exceeded; 0 disables eviction.
+    memsize : int
+        Memory budget in bytes for parsed data kept in memory between calls.
+        0 disables the in-memory cache.
 
     Examples
     --------
@@ -42,6 +54,10 @@ class config:
     __cache = Path.home() / ".cache" / "infoml"
     __datadir = Path.home() / ".data" / "infoml"
     __tempdir = Path(tempfile.gettempdir()) / "infoml"
+    __chunksize = 0
+    __ttl = 24 * 60 * 60.0
+    __cachesize = 10 * 1024**3
+    __memsize = 2 * 1024**3
 
     def __init__(self):
         """Initialize the configuration class"""
@@ -88,6 +104,46 @@ class config:
 
         return self.__tempdir
 
+    def chunksize(self, new_size: int | None = None) -> int:
+        """Download chunk size in bytes (0 to choose automatically)"""
+
+        if new_size is not None:
+            if new_size < 0:
+                raise ValueError("Chunk size must be non-negative")
+            self.__chunksize = int(new_size)
+
+        return self.__chunksize
+
+    def ttl(self, new_ttl: float | None = None) -> float:
+        """Seconds before cached downloads are revalidated"""
+
+        if new_ttl is not None:
+            if new_ttl < 0:
+                raise ValueError("TTL must be non-negative")
+            self.__ttl = float(new_ttl)
+
+        return self.__ttl
+
+    def cachesize(self, new_size: int | None = None) -> int:
+        """Maximum size of the cache directory in bytes (0 for no limit)"""
+
+        if new_size is not None:
+            if new_size < 0:
+                raise ValueError("Cache size must be non-negative")
+            self.__cachesize = int(new_size)
+
+        return self.__cachesize
+
+    def memsize(self, new_size: int | None = None) -> int:
+        """Memory budget of the in-memory cache in bytes (0 to disable)"""
+
+        if new_size is not None:
+            if new_size < 0:
+                raise ValueError("Memory size must be non-negative")
+            self.__memsize = int(new_size)
+
+        return self.__memsize
+
     def sysinfo(self) -> dict:
         """Get System Information"""
         return {
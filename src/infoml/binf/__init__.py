@@ -5,7 +5,9 @@ infoml.binf
 This sub-package contains functions for bioinformatics.
 """
 
+from . import cache
 from . import data
+from . import normalize
 
 
 if __name__ == "__main__":
@@ -13,7 +15,9 @@ if __name__ == "__main__":
 else:
     # Define module I/O
     __all__ = [
+        "cache",
         "data",
+        "normalize",
     ]
     __all__ += [m for m in dir() if m.startswith("__")]
 
@@ -0,0 +1,856 @@
+"""
+infoml.binf.cache
+-----------------
+
+This module contains a versioned, columnar on-disk format for caching parsed
+GEO data. Every GSM/GPL table is stored one file per column (numeric columns
+as `.npy` arrays that can be memory-mapped, text columns as UTF-8 bytes with
+offsets) and the metadata of every object is stored as JSON, so cached data
+can be partially loaded without unpickling whole GEOparse objects.
+
+It also contains `CacheManager`, which keys the entries of `CONFIG.cache()`
+by a fingerprint of the file they were built from and keeps the directory
+within `CONFIG.cachesize()` by evicting the least recently used entries,
+and `MemoryCache`, which keeps parsed objects in memory within
+`CONFIG.memsize()`.
+"""
+
+# Imports from standard library
+from collections import OrderedDict
+from pathlib import Path
+import threading
+import hashlib
+import shutil
+import json
+import time
+import os
+
+# Imports from third party packages
+from GEOparse.GEOTypes import GEODatabase, GPL, GSE, GSM
+import pandas as pd
+import numpy as np
+
+# Imports from local source
+from ..utils import CONFIG, FileLock, _readjson, _writejson
+
+
+# Version of the on-disk format; caches written by other versions are ignored
+FORMAT_VERSION = 1
+
+# GEOparse classes by type name
+GEOTYPES = {"GSE": GSE, "GPL": GPL, "GSM": GSM}
+
+
+def save_table(table: pd.DataFrame, path: str | Path) -> dict:
+    """
+    Save a table in columnar format.
+
+    Parameters
+    ----------
+    table : pd.DataFrame
+        Table to save. The index is not stored.
+    path : str | Path
+        Directory to write the column files to
+
+    Returns
+    -------
+    dict
+        Description of the stored table, needed by `load_table`
+    """
+
+    path = Path(path)
+    path.mkdir(parents=True, exist_ok=True)
+
+    columns = []
+    for i, name in enumerate(table.columns):
+        values = table.iloc[:, i]
+        if isinstance(values.dtype, np.dtype) and values.dtype.kind in "biuf":
+            np.save(path / f"{i}.npy", values.to_numpy())
+            columns.append({"name": str(name), "kind": "numeric"})
+            continue
+
+        # Text columns are stored as UTF-8 bytes with offsets and a null mask
+        missing = values.isna().to_numpy()
+        encoded = [b"" if na else str(v).encode() for v, na in zip(values, missing)]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(x) for x in encoded], out=offsets[1:])
+        (path / f"{i}.bin").write_bytes(b"".join(encoded))
+        np.save(path / f"{i}.off.npy", offsets)
+        if missing.any():
+            np.save(path / f"{i}.na.npy", missing)
+        columns.append({"name": str(name), "kind": "text"})
+
+    return {"nrows": len(table), "columns": columns}
+
+
+def load_table(
+    path: str | Path,
+    spec: dict,
+    columns: list | None = None,
+    mmap: bool = False,
+) -> pd.DataFrame:
+    """
+    Load a table saved by `save_table`.
+
+    Parameters
+    ----------
+    path : str | Path
+        Directory containing the column files
+    spec : dict
+        Description of the table returned by `save_table`
+    columns : list, optional
+        Names of the columns to load, by default all columns. Names that are
+        not in the table are ignored.
+    mmap : bool, optional
+        Whether to memory-map numeric columns (read-only) instead of reading
+        them into memory, by default False
+
+    Returns
+    -------
+    pd.DataFrame
+        The stored table
+    """
+
+    path = Path(path)
+    data = dict()
+    for i, column in enumerate(spec["columns"]):
+        name = column["name"]
+        if columns is not None and name not in columns:
+            continue
+
+        if column["kind"] == "numeric":
+            data[name] = np.load(path / f"{i}.npy", mmap_mode="r" if mmap else None)
+            continue
+
+        raw = (path / f"{i}.bin").read_bytes()
+        offsets = np.load(path / f"{i}.off.npy").tolist()
+        values = np.array(
+            [raw[a:b].decode() for a, b in zip(offsets[:-1], offsets[1:])],
+            dtype=object,
+        )
+        if (path / f"{i}.na.npy").is_file():
+            values[np.load(path / f"{i}.na.npy")] = np.nan
+        data[name] = values
+
+    # Avoid consolidating columns so memory-mapped arrays are not copied
+    return pd.DataFrame(data, index=pd.RangeIndex(spec["nrows"]), copy=False)
+
+
+def _describe(obj, tablesdir: Path) -> dict:
+    """Describe a GEO object and save its table"""
+
+    entry = {"type": type(obj).__name__, "metadata": obj.metadata}
+    if isinstance(obj, (GSM, GPL)):
+        entry["columns"] = obj.columns.to_dict(orient="split")
+        entry["table"] = save_table(obj.table, tablesdir / obj.name)
+    return entry
+
+
+def save_geo(geodata: GSE | GPL, path: str | Path) -> None:
+    """
+    Save a parsed GEO series or platform in the columnar cache format.
+
+    The cache is written to a temporary directory that is then renamed to
+    `path`, replacing any previous cache.
+
+    Parameters
+    ----------
+    geodata : GSE | GPL
+        Parsed GEO data
+    path : str | Path
+        Directory for the cache
+    """
+
+    path = Path(path)
+    temp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    shutil.rmtree(temp, ignore_errors=True)
+    tablesdir = temp / "tables"
+    tablesdir.mkdir(parents=True)
+
+    meta = {
+        "version": FORMAT_VERSION,
+        "name": geodata.name,
+        **_describe(geodata, tablesdir),
+        "database": None,
+        "gsms": {},
+        "gpls": {},
+    }
+    if geodata.database is not None:
+        meta["database"] = {
+            "name": geodata.database.name,
+            "metadata": geodata.database.metadata,
+        }
+    for name, gsm in geodata.gsms.items():
+        meta["gsms"][name] = _describe(gsm, tablesdir)
+    for name, gpl in getattr(geodata, "gpls", {}).items():
+        meta["gpls"][name] = _describe(gpl, tablesdir)
+
+    with open(temp / "meta.json", "w") as f:
+        json.dump(meta, f)
+
+    shutil.rmtree(path, ignore_errors=True)
+    os.replace(temp, path)
+
+
+def _build(
+    name: str,
+    entry: dict,
+    tablesdir: Path,
+    tables: list | None,
+    columns: list | None,
+    mmap: bool,
+):
+    """Rebuild a GSM or GPL from its cache entry"""
+
+    if tables is not None and name not in tables:
+        table = pd.DataFrame()
+        description = pd.DataFrame(columns=["description"])
+    else:
+        table = load_table(tablesdir / name, entry["table"], columns, mmap)
+        description = pd.DataFrame(**entry["columns"]).loc[table.columns]
+    return GEOTYPES[entry["type"]](name, entry["metadata"], table, description)
+
+
+def load_geo(
+    path: str | Path,
+    tables: list | None = None,
+    columns: list | None = None,
+    mmap: bool = False,
+) -> GSE | GPL | None:
+    """
+    Load a GEO series or platform saved by `save_geo`.
+
+    Parameters
+    ----------
+    path : str | Path
+        Directory of the cache
+    tables : list, optional
+        Names of the GSMs/GPLs whose tables should be loaded, by default all.
+        The other objects keep their metadata but get an empty table.
+    columns : list, optional
+        Names of the table columns to load, by default all columns
+    mmap : bool, optional
+        Whether to memory-map numeric columns, by default False
+
+    Returns
+    -------
+    GSE | GPL | None
+        The cached data, or None if there is no cache in the current format
+    """
+
+    path = Path(path)
+    try:
+        with open(path / "meta.json", "r") as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if meta.get("version") != FORMAT_VERSION:
+        return None
+
+    tablesdir = path / "tables"
+    gsms = {
+        name: _build(name, entry, tablesdir, tables, columns, mmap)
+        for name, entry in meta["gsms"].items()
+    }
+    gpls = {
+        name: _build(name, entry, tablesdir, tables, columns, mmap)
+        for name, entry in meta["gpls"].items()
+    }
+    database = None
+    if meta["database"] is not None:
+        database = GEODatabase(meta["database"]["name"], meta["database"]["metadata"])
+
+    if meta["type"] == "GSE":
+        return GSE(meta["name"], meta["metadata"], gpls, gsms, database)
+    gpl = _build(meta["name"], meta, tablesdir, tables, columns, mmap)
+    gpl.gsms, gpl.database = gsms, database
+    return gpl
+
+
+def subset_geo(
+    geodata: GSE | GPL | GSM,
+    tables: list | None = None,
+    columns: list | None = None,
+) -> GSE | GPL | GSM:
+    """
+    Restrict a parsed GEO object to some tables and columns.
+
+    Applies the same selection as `load_geo` to data that was just parsed, so
+    that cached and freshly parsed data look the same. Tables are modified in
+    place.
+
+    Parameters
+    ----------
+    geodata : GSE | GPL | GSM
+        Parsed GEO data
+    tables : list, optional
+        Names of the GSMs/GPLs whose tables should be kept, by default all
+    columns : list, optional
+        Names of the table columns to keep, by default all columns
+
+    Returns
+    -------
+    GSE | GPL | GSM
+        `geodata`
+    """
+
+    if tables is None and columns is None:
+        return geodata
+
+    objects = list(getattr(geodata, "gsms", {}).values())
+    objects += list(getattr(geodata, "gpls", {}).values())
+    if isinstance(geodata, (GPL, GSM)):
+        objects.append(geodata)
+    for obj in objects:
+        if tables is not None and obj.name not in tables:
+            obj.table = pd.DataFrame()
+            obj.columns = pd.DataFrame(columns=["description"])
+        elif columns is not None:
+            keep = [c for c in obj.table.columns if c in columns]
+            obj.table = obj.table[keep]
+            obj.columns = obj.columns.loc[keep]
+
+    return geodata
+
+
+class CacheManager:
+    """
+    Manager for the entries stored in the cache directory
+
+    Entries are keyed by name (e.g. a GEO accession) and by a fingerprint of
+    the source file they were built from, so an entry is not reused after
+    its source changes. The fingerprint records the size, modification time
+    and SHA-256 of the source; the hash is only recomputed when the size or
+    modification time change. Entries are tracked in `index.json` in the
+    cache directory, which is shared by all processes using the cache.
+
+    Attributes
+    ----------
+    root : Path
+        Cache directory, by default `CONFIG.cache()`
+    maxsize : int
+        Disk budget in bytes, by default `CONFIG.cachesize()`. 0 disables
+        eviction.
+    stats : dict
+        Number of cache hits, misses and evictions in this process
+
+    Methods
+    -------
+    fingerprint(source: str | Path) -> dict
+        Fingerprint of a source file
+    get(name: str, source: str | Path | None=None, suffix: str="") -> Path | None
+        Path of a cached entry, if there is one
+    key(name: str, source: str | Path | None=None, suffix: str="") -> str
+        File name of the entry for a name and source
+    path(name: str, source: str | Path | None=None, suffix: str="") -> Path
+        Path for storing a new entry
+    add(name: str, path: str | Path, source: str | Path | None=None) -> Path
+        Register a new entry and enforce the disk budget
+    prune(maxsize: int | None=None, older_than: float | None=None,
+          name: str | None=None) -> list
+        Remove entries from the cache
+    info() -> dict
+        Summary of the cache contents and statistics
+
+    Examples
+    --------
+    >>> path = CACHE.get("GSE1", "GSE1_family.soft.gz", ".geocache")
+    >>> if path is None:
+    ...     path = CACHE.path("GSE1", "GSE1_family.soft.gz", ".geocache")
+    ...     save_geo(geodata, path)
+    ...     CACHE.add("GSE1", path, "GSE1_family.soft.gz")
+    """
+
+    INDEX = "index.json"
+
+    def __init__(
+        self, root: str | Path | None = None, maxsize: int | None = None
+    ) -> None:
+        """Initialize CacheManager class"""
+        self._root = root
+        self._maxsize = maxsize
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0}
+
+    @property
+    def root(self) -> Path:
+        """Cache directory"""
+        return Path(self._root or CONFIG.cache()).resolve()
+
+    @property
+    def maxsize(self) -> int:
+        """Disk budget in bytes"""
+        return CONFIG.cachesize() if self._maxsize is None else self._maxsize
+
+    def _index(self) -> tuple[FileLock, Path]:
+        """Lock and path of the index"""
+        index = self.root / self.INDEX
+        return FileLock(index.with_suffix(".lock")), index
+
+    def _count(self, stat: str, n: int = 1) -> None:
+        """Update the statistics of this process"""
+        with self._lock:
+            self.stats[stat] += n
+
+    def fingerprint(self, source: str | Path) -> dict:
+        """
+        Fingerprint of a source file.
+
+        Parameters
+        ----------
+        source : str | Path
+            Path to the file
+
+        Returns
+        -------
+        dict
+            Path, size, modification time (ns) and SHA-256 of the file
+        """
+
+        source = Path(source).resolve()
+        stat = source.stat()
+        fingerprint = {
+            "path": str(source),
+            "size": stat.st_size,
+            "mtime": stat.st_mtime_ns,
+        }
+
+        lock, index = self._index()
+        with lock:
+            known = _readjson(index).get("sources", {}).get(str(source), {})
+        if all(known.get(k) == v for k, v in fingerprint.items()):
+            return known
+
+        digest = hashlib.sha256()
+        with open(source, "rb") as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(chunk)
+        fingerprint["sha256"] = digest.hexdigest()
+
+        with lock:
+            state = _readjson(index)
+            state.setdefault("sources", {})[str(source)] = fingerprint
+            _writejson(index, state)
+        return fingerprint
+
+    def key(self, name: str, source: str | Path | None = None, suffix: str = "") -> str:
+        """File name of the entry for a name and source"""
+        if source is None:
+            return f"{name}{suffix}"
+        return f"{name}-{self.fingerprint(source)['sha256'][:16]}{suffix}"
+
+    def get(
+        self, name: str, source: str | Path | None = None, suffix: str = ""
+    ) -> Path | None:
+        """
+        Path of a cached entry, if there is one.
+
+        Parameters
+        ----------
+        name : str
+            Name of the entry
+        source : str | Path, optional
+            File the entry was built from. If not given, the most recently
+            used entry with this name is returned.
+        suffix : str, optional
+            Suffix of the entry, as given to `path`
+
+        Returns
+        -------
+        Path | None
+            Path of the entry, or None on a cache miss
+        """
+
+        exact = None if source is None else self.key(name, source, suffix)
+        lock, index = self._index()
+        with lock:
+            state = _readjson(index)
+            entries = state.get("entries", {})
+            matches = [
+                key
+                for key, entry in entries.items()
+                if entry["name"] == name
+                and Path(key).suffix == suffix
+                and (exact is None or key == exact)
+                and (self.root / key).exists()
+            ]
+            if not matches:
+                self._count("misses")
+                return None
+
+            key = max(matches, key=lambda k: entries[k]["atime"])
+            entries[key]["atime"] = time.time()
+            _writejson(index, state)
+
+        self._count("hits")
+        return self.root / key
+
+    def path(
+        self, name: str, source: str | Path | None = None, suffix: str = ""
+    ) -> Path:
+        """
+        Path for storing a new entry.
+
+        Parameters
+        ----------
+        name : str
+            Name of the entry
+        source : str | Path, optional
+            File the entry is built from
+        suffix : str, optional
+            Suffix of the entry, e.g. ".geocache"
+
+        Returns
+        -------
+        Path
+            Path inside the cache directory
+        """
+
+        return self.root / self.key(name, source, suffix)
+
+    def add(
+        self, name: str, path: str | Path, source: str | Path | None = None
+    ) -> Path:
+        """
+        Register a new entry and enforce the disk budget.
+
+        Entries with the same name and suffix that were built from an earlier
+        version of the same source file are removed, then the least recently
+        used entries are evicted until the cache fits in `maxsize`. The new
+        entry is never evicted.
+
+        Parameters
+        ----------
+        name : str
+            Name of the entry
+        path : str | Path
+            Path of the entry, as returned by `path`
+        source : str | Path, optional
+            File the entry was built from
+
+        Returns
+        -------
+        Path
+            `path`
+        """
+
+        path = Path(path)
+        fingerprint = None if source is None else self.fingerprint(source)
+        lock, index = self._index()
+        with lock:
+            state = _readjson(index)
+            entries = state.setdefault("entries", {})
+            stale = [
+                key
+                for key, entry in entries.items()
+                if key != path.name
+                and entry["name"] == name
+                and Path(key).suffix == path.suffix
+                and fingerprint is not None
+                and (entry["source"] or {}).get("path") == fingerprint["path"]
+            ]
+            for key in stale:
+                _remove(self.root / key)
+                del entries[key]
+
+            entries[path.name] = {
+                "name": name,
+                "size": _du(path),
+                "atime": time.time(),
+                "source": fingerprint,
+            }
+            evicted = self._evict(entries, self.maxsize, keep=path.name)
+            _writejson(index, state)
+
+        self._count("evictions", len(evicted))
+        return path
+
+    def _evict(self, entries: dict, maxsize: int, keep: str = "") -> list:
+        """Remove least recently used entries until the cache fits"""
+        evicted = []
+        if maxsize <= 0:
+            return evicted
+        total = sum(entry["size"] for entry in entries.values())
+        for key in sorted(entries, key=lambda k: entries[k]["atime"]):
+            if total <= maxsize:
+                break
+            if key == keep:
+                continue
+            total -= entries[key]["size"]
+            _remove(self.root / key)
+            del entries[key]
+            evicted.append(key)
+        return evicted
+
+    def prune(
+        self,
+        maxsize: int | None = None,
+        older_than: float | None = None,
+        name: str | None = None,
+    ) -> list:
+        """
+        Remove entries from the cache.
+
+        Entries whose files are missing are always dropped from the index.
+
+        Parameters
+        ----------
+        maxsize : int, optional
+            Evict the least recently used entries until the cache is at most
+            this many bytes, by default `self.maxsize`
+        older_than : float, optional
+            Remove entries that were not used in this many seconds
+        name : str, optional
+            Remove all entries with this name
+
+        Returns
+        -------
+        list
+            File names of the removed entries
+        """
+
+        maxsize = self.maxsize if maxsize is None else maxsize
+        assert maxsize >= 0, "maxsize must be non-negative"
+
+        lock, index = self._index()
+        now = time.time()
+        with lock:
+            state = _readjson(index)
+            entries = state.setdefault("entries", {})
+            removed = []
+            for key, entry in list(entries.items()):
+                old = older_than is not None and now - entry["atime"] > older_than
+                if old or entry["name"] == name or not (self.root / key).exists():
+                    _remove(self.root / key)
+                    del entries[key]
+                    removed.append(key)
+            removed += self._evict(entries, maxsize)
+            _writejson(index, state)
+
+        self._count("evictions", len(removed))
+        return removed
+
+    def info(self) -> dict:
+        """
+        Summary of the cache contents and statistics.
+
+        Returns
+        -------
+        dict
+            Number of entries, total size, disk budget and the hit, miss and
+            eviction counts of this process
+        """
+
+        lock, index = self._index()
+        with lock:
+            entries = _readjson(index).get("entries", {})
+        with self._lock:
+            stats = dict(self.stats)
+        return {
+            "entries": len(entries),
+            "size": sum(entry["size"] for entry in entries.values()),
+            "maxsize": self.maxsize,
+            **stats,
+        }
+
+    def __repr__(self) -> str:
+        """Return string representation of CacheManager class"""
+        return f"{self.__class__.__name__}({self.root})"
+
+
+def _du(path: Path) -> int:
+    """Size of a file or directory tree in bytes"""
+    if path.is_file():
+        return path.stat().st_size
+    return sum(f.stat().st_size for f in path.rglob("*") if f.is_file())
+
+
+def _remove(path: Path) -> None:
+    """Remove a file or directory tree if it exists"""
+    if path.is_dir():
+        shutil.rmtree(path, ignore_errors=True)
+    elif path.exists():
+        path.unlink()
+
+
+class MemoryCache:
+    """
+    Least recently used cache of objects in memory
+
+    The cache is bounded by the estimated memory footprint of its values
+    (see `footprint`) rather than by the number of entries. It is safe to
+    use from several threads.
+
+    Attributes
+    ----------
+    maxsize : int
+        Memory budget in bytes, by default `CONFIG.memsize()`. 0 disables
+        the cache.
+    size : int
+        Estimated footprint of the cached values in bytes
+    stats : dict
+        Number of cache hits, misses and evictions
+
+    Methods
+    -------
+    get(key: Hashable, default=None)
+        Cached value for a key
+    put(key: Hashable, value, size: int | None=None) -> None
+        Cache a value
+    clear() -> None
+        Remove all values
+    info() -> dict
+        Summary of the cache contents and statistics
+    """
+
+    def __init__(self, maxsize: int | None = None) -> None:
+        """Initialize MemoryCache class"""
+        self._maxsize = maxsize
+        self._values = OrderedDict()
+        self._lock = threading.RLock()
+        self.size = 0
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0}
+
+    @property
+    def maxsize(self) -> int:
+        """Memory budget in bytes"""
+        return CONFIG.memsize() if self._maxsize is None else self._maxsize
+
+    def get(self, key, default=None):
+        """Cached value for a key, or `default` on a cache miss"""
+        with self._lock:
+            if key not in self._values:
+                self.stats["misses"] += 1
+                return default
+            self._values.move_to_end(key)
+            self.stats["hits"] += 1
+            return self._values[key][0]
+
+    def put(self, key, value, size: int | None = None) -> None:
+        """
+        Cache a value, evicting the least recently used values to make room.
+
+        Parameters
+        ----------
+        key : Hashable
+            Key of the value
+        value : Any
+            Value to cache. Values larger than `maxsize` are not cached.
+        size : int, optional
+            Footprint of the value in bytes, by default `footprint(value)`
+        """
+
+        size = footprint(value) if size is None else size
+        with self._lock:
+            if key in self._values:
+                self.size -= self._values.pop(key)[1]
+            if size > self.maxsize:
+                return
+            self._values[key] = (value, size)
+            self.size += size
+            while self.size > self.maxsize:
+                _, (_, evicted) = self._values.popitem(last=False)
+                self.size -= evicted
+                self.stats["evictions"] += 1
+
+    def clear(self) -> None:
+        """Remove all values"""
+        with self._lock:
+            self._values.clear()
+            self.size = 0
+
+    def info(self) -> dict:
+        """Number of values, their footprint, the budget and statistics"""
+        with self._lock:
+            return {
+                "entries": len(self._values),
+                "size": self.size,
+                "maxsize": self.maxsize,
+                **self.stats,
+            }
+
+    def __contains__(self, key) -> bool:
+        """Check if a key is cached without counting a hit or miss"""
+        with self._lock:
+            return key in self._values
+
+    def __len__(self) -> int:
+        """Number of cached values"""
+        return len(self._values)
+
+    def __repr__(self) -> str:
+        """Return string representation of MemoryCache class"""
+        return f"{self.__class__.__name__}(maxsize={self.maxsize})"
+
+
+def footprint(obj) -> int:
+    """
+    Estimate the memory used by a table or parsed GEO object.
+
+    Memory-mapped columns are not counted since they are backed by files.
+
+    Parameters
+    ----------
+    obj : pd.DataFrame | GSE | GPL | GSM
+        Object to measure
+
+    Returns
+    -------
+    int
+        Estimated size in bytes
+    """
+
+    if isinstance(obj, pd.DataFrame):
+        size = obj.memory_usage(index=True, deep=True)
+        mapped = [
+            isinstance(obj.iloc[:, i].values, np.memmap) for i in range(obj.shape[1])
+        ]
+        return int(size.iloc[1:][~np.array(mapped, dtype=bool)].sum() + size.iloc[0])
+
+    if isinstance(obj, (GSE, GPL, GSM)):
+        size = len(json.dumps(obj.metadata))
+        # Tables that are loaded on access are only counted once loaded
+        if isinstance(obj, (GPL, GSM)) and getattr(obj, "loaded", True):
+            size += footprint(obj.table)
+        children = list(getattr(obj, "gsms", {}).values())
+        children += list(getattr(obj, "gpls", {}).values())
+        for child in children:
+            size += footprint(child)
+        return size
+
+    return int(getattr(obj, "nbytes", 0)) or len(json.dumps(obj, default=str))
+
+
+# Shared cache manager and in-memory cache
+CACHE = CacheManager()
+MEMO = MemoryCache()
+
+
+if __name__ == "__main__":
+    print("This module is not intended to be run directly.")
+else:
+    # Define module I/O
+    __all__ = [
+        "FORMAT_VERSION",
+        "save_table",
+        "load_table",
+        "save_geo",
+        "load_geo",
+        "subset_geo",
+        "CacheManager",
+        "CACHE",
+        "MemoryCache",
+        "MEMO",
+        "footprint",
+    ]
+    __all__ += [m for m in dir() if m.startswith("__")]
+
+    def __dir__():
+        """Override default dir() behavior"""
+        return __all__
+
+    def __getattr__(name):
+        """Override default getattr() behavior"""
+        if name not in __all__:
+            raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+        return globals()[name]
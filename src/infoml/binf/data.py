@@ -7,25 +7,59 @@ repositiories like Gene Expression Omnibus and the Curated Microarray Database.
 """
 
 # Imports from standard library
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+    as_completed,
+    wait,
+)
+from collections import deque
+from io import BytesIO
+from contextlib import closing, nullcontext
+from typing import Iterator, Union
+from bisect import bisect_right
 from pathlib import Path
-from typing import Union
+import multiprocessing
 import warnings
-import pickle
+import sqlite3
+import hashlib
+import shutil
+import gzip
+import zlib
 import json
 import re
 import os
 
 # Imports from third party packages
-from GEOparse.GEOTypes import GPL, GSE
+from GEOparse.GEOTypes import GEODatabase, GPL, GSE, GSM
+from GEOparse.GEOparse import (
+    parse_columns,
+    parse_GPL,
+    parse_GSM,
+    parse_metadata,
+    parse_table_data,
+)
 from GEOparse import get_GEO
 from tqdm.auto import tqdm
+from scipy import sparse
 from rich import print
 import pandas as pd
 import numpy as np
 
 # Imports from local source
-from ..utils import CONFIG, downloadurl
+from ..utils import CONFIG, FileLock, _readjson, _writejson, downloadurl
+from .cache import CACHE, GEOTYPES, MEMO, load_geo, save_geo, subset_geo
+
+
+# Version of the binary copies of CuMiDa CSV files
+CUMIDA_FORMAT = 1
 
+# Version of the CuMiDa catalog
+CATALOG_FORMAT = 1
+
+# Methods for collapsing probes into genes
+COLLAPSE = ("mean", "max", "median", "maxvar")
 
 # Suppress DtypeWarning from GEOparse
 warnings.filterwarnings(
@@ -33,17 +67,80 @@ warnings.filterwarnings(
 )
 
 
+def geourl(acc: str) -> str:
+    """
+    Get the download URL for a GEO series or platform.
+
+    GSEs point to the family SOFT file on the GEO FTP site (over HTTPS) and
+    GPLs point to the full text view of the platform, matching the files
+    downloaded by `GEOparse.get_GEO`.
+
+    Parameters
+    ----------
+    acc : str
+        GEO accession
+
+    Returns
+    -------
+    str
+        URL of the SOFT file
+    """
+
+    acc = acc.upper()
+    if acc.startswith("GSE"):
+        subdir = re.sub(r"\d{1,3}$", "nnn", acc)
+        return (
+            "https://ftp.ncbi.nlm.nih.gov/geo/series/"
+            f"{subdir}/{acc}/soft/{acc}_family.soft.gz"
+        )
+    elif acc.startswith("GPL"):
+        return (
+            "https://www.ncbi.nlm.nih.gov/geo/query/acc.cgi"
+            f"?targ=self&acc={acc}&form=text&view=full"
+        )
+    raise ValueError("acc must be a GSE or GPL accession")
+
+
 def geodlparse(
     acc: str,
     datadir: str | Path = "",
     silent: bool = True,
     make_dir: bool = False,
     cache: bool = False,
+    tables: list | None = None,
+    columns: list | None = None,
+    mmap: bool = False,
+    memo: bool = True,
+    lazy: bool = False,
+    workers: int = 1,
+    errors: str = "print",
 ) -> GSE | GPL:  # type: ignore
     """
     Download, parse and cache data from GEO.
     This fuction only downloads GSE and GPL data.
 
+    Cached data is stored in `CONFIG.cache()` in the columnar format of
+    `infoml.binf.cache`, so cache hits can load only the tables and columns
+    that are needed. Entries are managed by `infoml.binf.cache.CACHE`: they
+    are keyed by a fingerprint of the downloaded SOFT file, so a changed file
+    is parsed again, and old entries are evicted to stay within
+    `CONFIG.cachesize()`.
+
+    Parsed objects are also kept in memory (`infoml.binf.cache.MEMO`), keyed
+    by accession, file fingerprint and selection, so calling this function
+    again in the same process returns the same object without parsing.
+    Objects returned from memory are shared and should not be modified.
+
+    With `lazy=True`, a GSE is opened by scanning the SOFT file for the
+    metadata of the series, platforms and samples, recording where each
+    sample table starts and ends. Sample tables are only read and parsed
+    when their `table` attribute is first accessed (see `LazyGSM`). Lazy
+    handles always read the SOFT file and do not use the cache.
+
+    With `workers > 1`, the sample tables of a GSE are parsed by a pool of
+    worker processes (see `parsegse`); the result is the same as the serial
+    parse.
+
     Parameters
     ----------
     acc : str
@@ -58,6 +155,29 @@ def geodlparse(
         by default False
     cache : bool, optional
         Whether to cache the data, by default False
+    tables : list, optional
+        Names of the GSMs/GPLs whose tables should be loaded, by default all.
+        The other objects keep their metadata but get an empty table.
+    columns : list, optional
+        Names of the table columns to keep, by default all columns. Unless
+        the data is cached, the other columns are skipped while parsing,
+        e.g. `columns=["ID", "GB_ACC"]` for a platform annotation table.
+    mmap : bool, optional
+        Whether to memory-map the numeric columns of cached tables,
+        by default False
+    memo : bool, optional
+        Whether to reuse and keep parsed objects in memory, by default True.
+        Reused objects are shared by every call that returns them, so changes
+        made by one caller are seen by the others; use `memo=False` to get an
+        object that can be modified.
+    lazy : bool, optional
+        Whether to load sample tables of a GSE on access, by default False
+    workers : int, optional
+        Number of processes for parsing the sample tables of a GSE,
+        by default 1
+    errors : str, optional
+        What to do if the data cannot be downloaded or parsed: "print" the
+        error and return None, or "raise" it, by default "print"
 
     Returns
     -------
@@ -88,58 +208,1467 @@ def geodlparse(
 
     assert isinstance(silent, bool), "silent must be a boolean"
     assert isinstance(make_dir, bool), "make_dir must be a boolean"
+    assert isinstance(workers, int) and workers > 0, "workers must be positive"
+    assert errors in ("print", "raise"), "errors must be 'print' or 'raise'"
 
     # Define file names
-    geofile = datadir.joinpath(
+    geofile = _geofile(acc, datadir)
+
+    # Lazy handles are cheap to open and grow as tables are loaded, so they
+    # are not kept in memory
+    lazy = lazy and acc.startswith("GSE")
+    memo = memo and not lazy
+
+    # Reuse an object parsed from the same file earlier in this process
+    if memo and geofile.is_file():
+        geodata = MEMO.get(_memokey(acc, geofile, tables, columns, mmap))
+        if geodata is not None:
+            return geodata
+
+    # Only one process builds the cache for an accession; the others wait
+    # and load it. Downloads are already single-flight in `downloadurl`.
+    lock = FileLock(CACHE.root / f"{acc}.lock") if cache and not lazy else nullcontext()
+    with lock:
+        geodata = _geodlparse(
+            acc, geofile, silent, cache, tables, columns, mmap, lazy, workers, errors
+        )
+
+    if memo and geodata is not None and geofile.is_file():
+        MEMO.put(_memokey(acc, geofile, tables, columns, mmap), geodata)
+    return geodata
+
+
+def _geofile(acc: str, datadir: Path) -> Path:
+    """Path of the downloaded SOFT file of an accession"""
+    return datadir.joinpath(
         f"{acc}.txt" if acc[:3] == "GPL" else f"{acc}_family.soft.gz"
     ).resolve()
-    cachefile = (CONFIG.cache() / f"{acc}.cache").resolve()
 
-    # Load cached data if it exists
-    if cachefile.is_file():
+
+def _memokey(
+    acc: str, geofile: Path, tables: list | None, columns: list | None, mmap: bool
+) -> tuple:
+    """Key of a parsed GEO object in `MEMO`"""
+    return (
+        CACHE.key(acc, geofile),
+        None if tables is None else tuple(tables),
+        None if columns is None else tuple(columns),
+        mmap,
+    )
+
+
+def _geodlparse(
+    acc: str,
+    geofile: Path,
+    silent: bool,
+    cache: bool,
+    tables: list | None,
+    columns: list | None,
+    mmap: bool,
+    lazy: bool = False,
+    workers: int = 1,
+    errors: str = "print",
+) -> GSE | GPL:  # type: ignore
+    """Body of `geodlparse`, run while holding the lock on the cache"""
+
+    # Load cached data built from the current SOFT file, or from any version
+    # of it if the file is not available
+    cachefile = None
+    if not lazy:
+        source = geofile if geofile.is_file() else None
+        cachefile = CACHE.get(acc, source, ".geocache")
+    if cachefile is not None:
         try:
             if not silent:
                 print(f"Loading cached data for {acc}")
-            with open(cachefile, "rb") as f:
-                return pickle.load(f)
+            geodata = load_geo(cachefile, tables, columns, mmap)
+            if geodata is not None:
+                return geodata
         except Exception as E:
             print(
                 f"[bold red]Error loading cached data[/bold red]", f"\n\n{E}", sep=" "
             )
 
     # Download, parse and cache data
+    try:
+        # Download data through the shared transport
+        if not os.path.isfile(geofile):
+            if not silent:
+                print(f"Downloading {acc}")
+            downloadurl(geourl(acc), geofile, progress=not silent)
+
+        # Parse downloaded data
+        if not silent:
+            print(f"Parsing {acc}")
+        # Columns are skipped by the parser unless the full data is cached
+        project = None if cache else columns
+        if lazy:
+            return opengse(geofile, columns)
+        elif acc.startswith("GSE") and (workers > 1 or project is not None):
+            geodata = parsegse(geofile, workers, project)
+        elif acc.startswith("GPL") and project is not None:
+            geodata = parsegpl(geofile, project)
+        else:
+            geodata = get_GEO(filepath=geofile.__str__(), silent=silent)
+
+        # Cache data; readers never see a partially written cache
+        if cache:
+            cachefile = CACHE.path(acc, geofile, ".geocache")
+            save_geo(geodata, cachefile)
+            CACHE.add(acc, cachefile, geofile)
+            if mmap:
+                return load_geo(cachefile, tables, columns, mmap)
+
+        return subset_geo(geodata, tables, columns)  # type: ignore
+
+    except OSError as E:
+        if errors == "raise":
+            raise
+        print(
+            "[bold red]Error[/bold red]: It seems you've entered",
+            f"an invalid accession number.\n\n{E}",
+            sep=" ",
+        )
+
+    except Exception as E:
+        if errors == "raise":
+            raise
+        print("[bold red]Error[/bold red]: Something went wrong.", f"\n\n{E}", sep=" ")
+
+
+def geodlparse_batch(
+    accs: list,
+    datadir: str | Path = "",
+    max_connections: int = 4,
+    workers: int | None = None,
+    **kwargs,
+) -> Iterator[tuple[str, GSE | GPL | Exception]]:
+    """
+    Download and parse many GEO accessions in parallel.
+
+    Downloads run in a pool of `max_connections` threads and each file is
+    handed to a pool of `workers` processes for parsing as soon as it
+    arrives, so network I/O overlaps with parsing. Results are yielded as
+    each accession finishes. Errors are returned in place of the result of
+    the accession that failed instead of being printed.
+
+    With `cache=True`, the workers store the parsed data in the shared
+    cache and it is loaded from there, instead of being sent back from the
+    worker process.
+
+    Parameters
+    ----------
+    accs : list
+        GEO accessions (GSE or GPL)
+    datadir : str | Path, optional
+        Directory for storing downloaded data, see `geodlparse`
+    max_connections : int, optional
+        Maximum number of simultaneous downloads, by default 4
+    workers : int, optional
+        Number of parsing processes, by default `os.cpu_count()`
+    **kwargs
+        Other arguments for `geodlparse`, e.g. `cache` or `columns`
+
+    Yields
+    ------
+    tuple[str, GSE | GPL | Exception]
+        Accession and its parsed data, or the error raised for it
+
+    Examples
+    --------
+    >>> for acc, gse in geodlparse_batch(["GSE1", "GSE2"], cache=True):
+    ...     if isinstance(gse, Exception):
+    ...         print(f"{acc} failed: {gse}")
+    """
+
+    assert isinstance(max_connections, int), "max_connections must be an int"
+    assert max_connections > 0, "max_connections must be positive"
+    workers = workers or os.cpu_count() or 1
+    assert workers > 0, "workers must be positive"
+
+    if datadir == "":
+        datadir = CONFIG.tempdir()
+    elif not os.path.exists(datadir):
+        if kwargs.get("make_dir", False):
+            os.makedirs(datadir)
+        else:
+            raise ValueError("Directory does not exist")
+    datadir = Path(datadir).resolve()
+    kwargs = {**kwargs, "errors": "raise"}
+
+    # Lazy handles cannot be sent between processes; they are cheap to open.
+    # Workers are not forked: they start while download threads hold locks
+    io = ThreadPoolExecutor(max_workers=max_connections)
+    if kwargs.get("lazy"):
+        cpu = io
     else:
-        try:
-            # Parse already downloaded data
-            if os.path.isfile(geofile):
-                if not silent:
-                    print(f"Parsing {acc}")
-                geodata = get_GEO(filepath=geofile.__str__(), silent=silent)
+        cpu = ProcessPoolExecutor(max_workers=workers, mp_context=_mpcontext())
+    jobs = {
+        io.submit(_fetch, acc.upper(), datadir, kwargs.get("cache", False)): acc
+        for acc in accs
+    }
+    parsing = set()
+    try:
+        while jobs:
+            done, _ = wait(jobs, return_when=FIRST_COMPLETED)
+            for job in done:
+                acc = jobs.pop(job)
+                if job.exception() is not None:
+                    yield acc, job.exception()  # type: ignore
+                elif job not in parsing:
+                    job = cpu.submit(
+                        _parsejob, acc, datadir, kwargs, _configstate(), io is cpu
+                    )
+                    jobs[job] = acc
+                    parsing.add(job)
+                elif job.result() is None:
+                    # The worker stored the data in the cache
+                    try:
+                        yield acc, geodlparse(acc, datadir, **kwargs)
+                    except Exception as E:
+                        yield acc, E
+                else:
+                    yield acc, job.result()
+    finally:
+        io.shutdown(wait=False, cancel_futures=True)
+        cpu.shutdown(wait=False, cancel_futures=True)
 
-            # Download and parse data
-            else:
-                if not silent:
-                    print(f"Downloading and parsing {acc}")
-                geodata = get_GEO(acc, destdir=datadir, silent=silent)  # type: ignore
 
-            # Cache data
-            if cache:
-                with open(cachefile, "wb") as handle:
-                    pickle.dump(geodata, file=handle)
+def _mpcontext() -> multiprocessing.context.BaseContext:
+    """Start method for worker processes that does not fork this process"""
+    methods = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context(
+        "forkserver" if "forkserver" in methods else "spawn"
+    )
 
-            return geodata  # type: ignore
 
-        except OSError as E:
-            print(
-                "[bold red]Error[/bold red]: It seems you've entered",
-                f"an invalid accession number.\n\n{E}",
-                sep=" ",
-            )
+def _fetch(acc: str, datadir: Path, cache: bool) -> None:
+    """Download the SOFT file of an accession unless it is not needed"""
+    geofile = _geofile(acc, datadir)
+    if geofile.is_file() or (cache and CACHE.get(acc, None, ".geocache")):
+        return
+    downloadurl(geourl(acc), geofile, progress=False)
 
-        except Exception as E:
-            print(
-                "[bold red]Error[/bold red]: Something went wrong.", f"\n\n{E}", sep=" "
-            )
+
+def _configstate() -> dict:
+    """Settings of `CONFIG` to restore in worker processes"""
+    names = ("cache", "datadir", "tempdir", "chunksize", "ttl", "cachesize", "memsize")
+    return {name: getattr(CONFIG, name)() for name in names}
+
+
+def _parsejob(
+    acc: str, datadir: Path, kwargs: dict, config: dict, inprocess: bool
+) -> GSE | GPL | None:
+    """Parse an accession in a worker of `geodlparse_batch`"""
+    if inprocess:
+        return geodlparse(acc, datadir, **kwargs)
+
+    # Worker processes start with the default configuration
+    for name, value in config.items():
+        getattr(CONFIG, name)(value)
+    geodata = geodlparse(acc, datadir, **kwargs)
+    return None if kwargs.get("cache", False) else geodata
+
+
+def iter_soft(
+    file: str | Path,
+    batch_size: int | None = None,
+    samples: list | None = None,
+    columns: list | None = None,
+) -> Iterator[GSM | list[GSM]]:
+    """
+    Stream the samples of a SOFT file.
+
+    The file is read once, one sample section at a time, and each sample is
+    parsed as soon as its section ends, so only the current sample (or batch
+    of samples) is held in memory. Series and platform sections are skipped;
+    use `geodlparse` to get them.
+
+    Parameters
+    ----------
+    file : str | Path
+        Path to a SOFT file, e.g. a (gzipped) GSE family SOFT file
+    batch_size : int, optional
+        Number of samples to yield at a time. By default samples are
+        yielded one by one.
+    samples : list, optional
+        Names of the GSMs to parse, by default all. Other samples are skipped
+        without being parsed.
+    columns : list, optional
+        Names of the table columns to keep, by default all columns
+
+    Yields
+    ------
+    GSM | list[GSM]
+        Parsed samples, or lists of at most `batch_size` samples
+
+    Examples
+    --------
+    >>> for gsm in iter_soft("GSE1_family.soft.gz"):
+    ...     print(gsm.name, gsm.metadata["characteristics_ch1"])
+    """
+
+    assert batch_size is None or batch_size > 0, "batch_size must be positive"
+
+    def keep(entry_type: str, name: str) -> bool:
+        return entry_type == "SAMPLE" and (samples is None or name in samples)
+
+    batch = []
+    with _opensoft(file) as f:
+        for _, name, lines in _soft_sections(f, keep):
+            gsm = subset_geo(parse_GSM(lines, name), None, columns)
+            if batch_size is None:
+                yield gsm
+                continue
+
+            batch.append(gsm)
+            if len(batch) == batch_size:
+                yield batch
+                batch = []
+
+    if batch:
+        yield batch
+
+
+def _opensoft(file: str | Path):
+    """Open a plain or gzipped SOFT file for reading text, like GEOparse"""
+    if str(file).endswith("gz"):
+        return gzip.open(file, "rt", errors="ignore")
+    return open(file, "r", errors="ignore")
+
+
+def _soft_sections(lines, keep=None) -> Iterator[tuple[str, str, list]]:
+    """
+    Split the lines of a SOFT file into (entry type, name, lines) sections.
+
+    Only the lines of sections for which `keep(entry_type, name)` is true are
+    collected; the others are skipped.
+    """
+
+    entry, body, wanted = None, [], False
+    for line in lines:
+        if line.startswith("^"):
+            if wanted:
+                yield (*entry, body)  # type: ignore
+            key, _, value = line[1:].partition("=")
+            entry, body = (key.strip(), value.strip()), []
+            wanted = keep is None or keep(*entry)
+        elif wanted:
+            body.append(line)
+
+    if wanted:
+        yield (*entry, body)  # type: ignore
+
+
+class LazyGSM(GSM):
+    """
+    GSM whose table is read from the SOFT file when it is first accessed
+
+    The metadata and column descriptions are parsed when the GSE is opened.
+    The table is parsed from the recorded byte range of the SOFT file on the
+    first access to `table` and kept afterwards.
+
+    Attributes
+    ----------
+    loaded : bool
+        Whether the table has been read
+    """
+
+    def __init__(
+        self,
+        name: str,
+        header: list,
+        soft: "_SoftFile",
+        span: tuple[int, int] | None,
+        columns: list | None = None,
+    ) -> None:
+        """Initialize LazyGSM class"""
+        description = parse_columns(header)
+        if columns is not None:
+            description = description.loc[
+                [c for c in description.index if c in columns]
+            ]
+        GSM.__init__(
+            self,
+            name=name,
+            metadata=parse_metadata(header),
+            table=pd.DataFrame(columns=description.index),
+            columns=description,
+        )
+        self._soft, self._span, self._select = soft, span, columns
+        self._table = None
+
+    @property
+    def loaded(self) -> bool:
+        """Whether the table has been read"""
+        return self._table is not None
+
+    @property
+    def table(self) -> pd.DataFrame:
+        """Sample table, read on first access"""
+        if self._table is None:
+            self._table = pd.DataFrame()
+            if self._span is not None:
+                text = self._soft.read(*self._span).decode("utf-8", "ignore")
+                self._table = parse_table_data(text.splitlines())
+            if self._select is not None:
+                keep = [c for c in self._table.columns if c in self._select]
+                self._table = self._table[keep]
+        return self._table
+
+    @table.setter
+    def table(self, table: pd.DataFrame) -> None:
+        """Replace the table"""
+        self._table = table
+
+
+def opengse(file: str | Path, columns: list | None = None) -> GSE:
+    """
+    Open a GSE family SOFT file without parsing the sample tables.
+
+    The file is scanned once; the series, database and platforms are parsed
+    and each sample becomes a `LazyGSM` that reads its table on access.
+
+    Parameters
+    ----------
+    file : str | Path
+        Path to a plain or gzipped family SOFT file
+    columns : list, optional
+        Names of the table columns to keep, by default all columns
+
+    Returns
+    -------
+    GSE
+        Series with lazily loaded sample tables
+    """
+
+    soft = _SoftFile(file)
+    name, metadata, database = None, {}, None
+    gsms, gpls = dict(), dict()
+    for entry_type, entry, header, span, table in _scan_soft(soft, ("PLATFORM",)):
+        if entry_type == "SERIES":
+            name, metadata = entry, parse_metadata(header)
+        elif entry_type == "SAMPLE":
+            gsms[entry] = LazyGSM(entry, header, soft, span, columns)
+        elif entry_type == "PLATFORM":
+            gpls[entry] = _parse_section("GPL", entry, header, table, columns)
+        elif entry_type == "DATABASE":
+            database = GEODatabase(name=entry, metadata=parse_metadata(header))
+
+    return GSE(name=name, metadata=metadata, gpls=gpls, gsms=gsms, database=database)
+
+
+def parsegse(
+    file: str | Path, workers: int | None = None, columns: list | None = None
+) -> GSE:
+    """
+    Parse a GSE family SOFT file, optionally using a pool of processes.
+
+    The file is read once and split at sample boundaries; with more than one
+    worker, the table of each sample is parsed in a worker process while the
+    file is still being read. The result is the same as parsing the file
+    with `GEOparse.get_GEO`, restricted to `columns` if they are given.
+
+    Parameters
+    ----------
+    file : str | Path
+        Path to a plain or gzipped family SOFT file
+    workers : int, optional
+        Number of worker processes, by default `os.cpu_count()`. With one
+        worker the file is parsed in this process.
+    columns : list, optional
+        Names of the table columns to parse, by default all columns. The
+        other columns are skipped by the parser.
+
+    Returns
+    -------
+    GSE
+        Parsed series
+    """
+
+    workers = workers or os.cpu_count() or 1
+    assert workers > 0, "workers must be positive"
+
+    soft = _SoftFile(file)
+    name, metadata, database = None, {}, None
+    gsms, gpls = dict(), dict()
+    pool = (
+        ProcessPoolExecutor(max_workers=workers, mp_context=_mpcontext())
+        if workers > 1
+        else nullcontext()
+    )
+    with pool:
+        # Keep a few samples per worker in flight to bound memory use
+        pending = deque()
+        for entry_type, entry, header, _, table in _scan_soft(
+            soft, ("PLATFORM", "SAMPLE")
+        ):
+            if entry_type == "SERIES":
+                name, metadata = entry, parse_metadata(header)
+            elif entry_type == "SAMPLE" and workers == 1:
+                gsms[entry] = _parse_section("GSM", entry, header, table, columns)
+            elif entry_type == "SAMPLE":
+                job = pool.submit(  # type: ignore
+                    _parse_section, "GSM", entry, header, table, columns
+                )
+                pending.append((entry, job))
+            elif entry_type == "PLATFORM":
+                gpls[entry] = _parse_section("GPL", entry, header, table, columns)
+            elif entry_type == "DATABASE":
+                database = GEODatabase(name=entry, metadata=parse_metadata(header))
+
+            while len(pending) > 2 * workers:
+                entry, job = pending.popleft()
+                gsms[entry] = job.result()
+
+        for entry, job in pending:
+            gsms[entry] = job.result()
+
+    return GSE(name=name, metadata=metadata, gpls=gpls, gsms=gsms, database=database)
+
+
+def parsegpl(file: str | Path, columns: list | None = None) -> GPL:
+    """
+    Parse a GPL SOFT file, optionally skipping table columns.
+
+    Platform annotation tables often contain long free-text columns (probe
+    sequences, GO terms, descriptions). Only the columns that are asked for
+    are parsed, which saves time and memory.
+
+    Parameters
+    ----------
+    file : str | Path
+        Path to a plain or gzipped GPL SOFT file
+    columns : list, optional
+        Names of the table columns to parse, by default all columns
+
+    Returns
+    -------
+    GPL
+        Parsed platform
+    """
+
+    gpl, database = None, None
+    for entry_type, entry, header, _, table in _scan_soft(
+        _SoftFile(file), ("PLATFORM",)
+    ):
+        if entry_type == "PLATFORM":
+            gpl = _parse_section("GPL", entry, header, table, columns)
+        elif entry_type == "DATABASE":
+            database = GEODatabase(name=entry, metadata=parse_metadata(header))
+
+    if gpl is None:
+        raise ValueError(f"No platform found in {file}")
+    gpl.database = database
+    return gpl
+
+
+def _parse_section(
+    geotype: str,
+    name: str,
+    header: list,
+    table: bytes | None,
+    columns: list | None = None,
+) -> GSM | GPL:
+    """Parse a GSM or GPL from its header lines and table rows"""
+
+    # Parse all columns the same way as GEOparse
+    if columns is None:
+        lines = list(header)
+        if table is not None:
+            lines += table.decode("utf-8", "ignore").splitlines()
+        return {"GSM": parse_GSM, "GPL": parse_GPL}[geotype](lines, name)
+
+    # Only parse the selected columns
+    data = pd.DataFrame()
+    if table:
+        data = pd.read_csv(
+            BytesIO(table),
+            sep="\t",
+            usecols=lambda c: c in columns,
+            encoding_errors="ignore",
+        )
+    description = parse_columns(header)
+    description = description.loc[[c for c in description.index if c in data]]
+    return GEOTYPES[geotype](
+        name=name, metadata=parse_metadata(header), table=data, columns=description
+    )
+
+
+class _SoftFile:
+    """
+    Random access to the text of a plain or gzipped file
+
+    Gzipped files are read through checkpoints of the decompressor state,
+    recorded every `spacing` compressed bytes while the file is scanned, so
+    reading a byte range only decompresses from the nearest checkpoint.
+    """
+
+    BLOCK = 1024 * 1024
+
+    def __init__(self, file: str | Path, spacing: int = 16 * 1024 * 1024) -> None:
+        """Initialize _SoftFile class"""
+        self.file = Path(file)
+        self.spacing = spacing
+        with open(self.file, "rb") as f:
+            self.gzipped = f.read(2) == b"\x1f\x8b"
+        self._checkpoints = [(0, 0, None)]
+
+    def blocks(
+        self, cpos: int = 0, upos: int = 0, decomp=None, record: bool = False
+    ) -> Iterator[tuple[int, bytes]]:
+        """Yield (offset, data) blocks of text starting at a checkpoint"""
+        with open(self.file, "rb") as f:
+            f.seek(cpos)
+            decomp = decomp.copy() if decomp else zlib.decompressobj(wbits=47)
+            last = cpos
+            while True:
+                if record and self.gzipped and cpos - last >= self.spacing:
+                    self._checkpoints.append((cpos, upos, decomp.copy()))
+                    last = cpos
+                chunk = f.read(self.BLOCK)
+                if not chunk:
+                    break
+                cpos += len(chunk)
+                if not self.gzipped:
+                    data = chunk
+                else:
+                    data = decomp.decompress(chunk)
+                    # Concatenated gzip members
+                    while decomp.eof and decomp.unused_data:
+                        rest = decomp.unused_data
+                        decomp = zlib.decompressobj(wbits=47)
+                        data += decomp.decompress(rest)
+                yield upos, data
+                upos += len(data)
+
+    def read(self, start: int, end: int) -> bytes:
+        """Read the text between two offsets"""
+        if not self.gzipped:
+            with open(self.file, "rb") as f:
+                f.seek(start)
+                return f.read(end - start)
+
+        positions = [upos for _, upos, _ in self._checkpoints]
+        cpos, upos, decomp = self._checkpoints[bisect_right(positions, start) - 1]
+        parts = []
+        for offset, data in self.blocks(cpos, upos, decomp):
+            if offset + len(data) > start:
+                parts.append(data[max(start - offset, 0) : end - offset])
+            if offset + len(data) >= end:
+                break
+        return b"".join(parts)
+
+
+def _scan_soft(soft: _SoftFile, collect: tuple = ()) -> Iterator[tuple]:
+    """
+    Scan a SOFT file for its sections, skipping over the tables.
+
+    Yields (entry type, name, header lines, table span, table) for each
+    section. The span gives the offsets of the table rows (without the begin
+    and end markers), or is None if the section has no table. The table rows
+    are only kept (as bytes) for the entry types in `collect`; otherwise the
+    last item is None.
+    """
+
+    entry, header, start, span = None, [], -1, None
+    intable, keep, parts = False, False, []
+    buf, base = b"", 0
+    for _, data in soft.blocks(record=True):
+        buf += data
+        pos = 0
+        while True:
+            if intable:
+                # Skip table rows until a line starting with "!"
+                i = buf.find(b"\n!", pos)
+                if i < 0:
+                    pos = max(pos, len(buf) - 1)
+                    break
+                j = buf.find(b"\n", i + 1)
+                if j < 0:
+                    pos = i
+                    break
+                if b"_table_end" in buf[i:j]:
+                    if keep:
+                        parts.append(buf[max(start - base, 0) : i + 1])
+                    span, intable = (start, base + i + 1), False
+                    pos = j + 1
+                else:
+                    pos = j
+                continue
+
+            j = buf.find(b"\n", pos)
+            if j < 0:
+                break
+            line = buf[pos:j].decode("utf-8", "ignore").rstrip()
+            if line.startswith("^"):
+                if entry is not None:
+                    yield (*entry, header, span, b"".join(parts) if keep else None)
+                key, _, value = line[1:].partition("=")
+                entry, header, span = (key.strip(), value.strip()), [], None
+                keep, parts = entry[0] in collect, []
+            elif "_table_begin" in line:
+                start, intable = base + j + 1, True
+                # Keep the newline so an empty table is found
+                pos = j
+                continue
+            elif entry is not None:
+                header.append(line)
+            pos = j + 1
+
+        if intable and keep:
+            parts.append(buf[max(start - base, 0) : pos])
+        buf, base = buf[pos:], base + pos
+
+    if buf and not intable and entry is not None:
+        line = buf.decode("utf-8", "ignore").rstrip()
+        if line and not line.startswith("^"):
+            header.append(line)
+    if entry is not None:
+        yield (*entry, header, span, b"".join(parts) if keep else None)
+
+
+def expression_matrix(
+    gse: GSE,
+    value: str = "VALUE",
+    platform: str | None = None,
+    dtype: type = np.float32,
+    out: str | Path | None = None,
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Build a samples x probes expression matrix from a parsed GSE.
+
+    The values of every sample are written into one preallocated array,
+    aligned on the probe IDs of the platform table by a single hash lookup
+    per sample. Probes missing from a sample are NaN and probes that are not
+    on the platform are dropped.
+
+    Parameters
+    ----------
+    gse : GSE
+        Parsed GEO series, e.g. from `geodlparse` (lazy handles work and
+        load each sample table once)
+    value : str, optional
+        Column of the sample tables holding the expression values,
+        by default "VALUE"
+    platform : str, optional
+        Platform whose samples are used, by default the only platform of
+        the series
+    dtype : type, optional
+        Floating point type of the matrix, by default np.float32
+    out : str | Path, optional
+        Path of a `.npy` file to write the matrix to as a memory-mapped
+        array, by default the matrix is kept in memory
+
+    Returns
+    -------
+    tuple[np.ndarray, np.ndarray, np.ndarray]
+        The matrix, the probe IDs (columns) and the sample names (rows)
+
+    Examples
+    --------
+    >>> gse = geodlparse("GSE1")
+    >>> X, probes, samples = expression_matrix(gse)
+    """
+
+    assert np.dtype(dtype).kind == "f", "dtype must be a floating point type"
+    if platform is None:
+        assert len(gse.gpls) == 1, "platform must be given for multi-platform series"
+        platform = list(gse.gpls)[0]
+    assert platform in gse.gpls, f"{platform} is not a platform of {gse.name}"
+
+    gsms = [
+        gsm
+        for gsm in gse.gsms.values()
+        if gsm.metadata.get("platform_id", [platform])[0] == platform
+    ]
+    samples = np.array([gsm.name for gsm in gsms], dtype=object)
+
+    # Use the probes of the platform, or of the samples if it has no table
+    table = gse.gpls[platform].table
+    if "ID" in table.columns:
+        probes = pd.Index(table["ID"].astype(str)).drop_duplicates()
+    else:
+        ids = [gsm.table["ID_REF"].astype(str) for gsm in gsms]
+        probes = pd.Index(pd.unique(np.concatenate(ids))) if ids else pd.Index([])
+
+    shape = (len(gsms), len(probes))
+    if out is None:
+        matrix = np.empty(shape, dtype=dtype)
+    else:
+        matrix = np.lib.format.open_memmap(out, mode="w+", dtype=dtype, shape=shape)
+    matrix[:] = np.nan
+
+    for i, gsm in enumerate(gsms):
+        positions = probes.get_indexer(gsm.table["ID_REF"].astype(str))
+        found = positions >= 0
+        values = pd.to_numeric(gsm.table[value], errors="coerce").to_numpy()
+        matrix[i, positions[found]] = values[found]
+
+    if isinstance(matrix, np.memmap):
+        matrix.flush()
+    return matrix, probes.to_numpy(dtype=object), samples
+
+
+class ProbeIndex:
+    """
+    Sorted probe annotations of a GEO platform
+
+    Maps probe IDs to GenBank accessions, gene symbols and Entrez gene IDs.
+    The probe IDs are stored as a sorted array, so many probes are looked up
+    at once with a binary search. Indexes are saved as `.npy` files that are
+    memory-mapped when loaded; use `probeindex` to build them once per
+    platform and share them through the cache.
+
+    Attributes
+    ----------
+    FIELDS : dict
+        Annotation fields and the GPL table columns they are read from, in
+        order of preference
+    ids : np.ndarray
+        Sorted probe IDs
+    annotations : dict
+        Annotation arrays aligned with `ids`; missing values are ""
+
+    Methods
+    -------
+    from_table(table: pd.DataFrame) -> ProbeIndex
+        Build an index from a GPL table
+    load(path: str | Path, mmap: bool=True) -> ProbeIndex
+        Load a saved index
+    save(path: str | Path) -> Path
+        Save the index
+    lookup(probes: list | np.ndarray, field: str="gb_acc") -> np.ndarray
+        Annotations of many probes
+    """
+
+    FIELDS = {
+        "gb_acc": ("GB_ACC", "GB_LIST", "GenBank_Accession"),
+        "symbol": ("Gene Symbol", "GENE_SYMBOL", "Symbol", "ILMN_Gene"),
+        "entrez": ("ENTREZ_GENE_ID", "Entrez_Gene_ID", "GENE"),
+    }
+
+    def __init__(self, ids: np.ndarray, annotations: dict) -> None:
+        """Initialize ProbeIndex class from sorted IDs and annotations"""
+        self.ids = ids
+        self.annotations = annotations
+
+    @classmethod
+    def from_table(cls, table: pd.DataFrame) -> "ProbeIndex":
+        """
+        Build an index from a GPL table.
+
+        Parameters
+        ----------
+        table : pd.DataFrame
+            Platform table with an `ID` column and any of the columns in
+            `FIELDS`
+
+        Returns
+        -------
+        ProbeIndex
+            Index of the probes in the table
+        """
+
+        ids = _strings(table["ID"]).astype(str)
+        order = np.argsort(ids, kind="stable")
+        annotations = dict()
+        for field, names in cls.FIELDS.items():
+            name = next((n for n in names if n in table.columns), None)
+            values = np.full(len(ids), "", dtype=object)
+            if name is not None:
+                values = _strings(table[name])
+            annotations[field] = values[order].astype(str)
+        return cls(ids[order], annotations)
+
+    @classmethod
+    def load(cls, path: str | Path, mmap: bool = True) -> "ProbeIndex":
+        """
+        Load an index saved by `save`.
+
+        Parameters
+        ----------
+        path : str | Path
+            Directory of the index
+        mmap : bool, optional
+            Whether to memory-map the arrays, by default True
+
+        Returns
+        -------
+        ProbeIndex
+            The saved index
+        """
+
+        path = Path(path)
+        mode = "r" if mmap else None
+        return cls(
+            np.load(path / "id.npy", mmap_mode=mode),
+            {f: np.load(path / f"{f}.npy", mmap_mode=mode) for f in cls.FIELDS},
+        )
+
+    def save(self, path: str | Path) -> Path:
+        """
+        Save the index as one `.npy` file per array.
+
+        The files are written to a temporary directory that is then renamed
+        to `path`.
+
+        Parameters
+        ----------
+        path : str | Path
+            Directory for the index
+
+        Returns
+        -------
+        Path
+            `path`
+        """
+
+        path = Path(path)
+        temp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        temp.mkdir(parents=True, exist_ok=True)
+        np.save(temp / "id.npy", self.ids)
+        for field, values in self.annotations.items():
+            np.save(temp / f"{field}.npy", values)
+        shutil.rmtree(path, ignore_errors=True)
+        os.replace(temp, path)
+        return path
+
+    def lookup(self, probes: list | np.ndarray, field: str = "gb_acc") -> np.ndarray:
+        """
+        Annotations of many probes.
+
+        Parameters
+        ----------
+        probes : list | np.ndarray
+            Probe IDs
+        field : str, optional
+            Annotation to return, one of `FIELDS`, by default "gb_acc"
+
+        Returns
+        -------
+        np.ndarray
+            Annotation of each probe, "" for probes that are not annotated or
+            not on the platform
+        """
+
+        assert field in self.FIELDS, f"field must be one of {list(self.FIELDS)}"
+        probes = np.asarray(probes).astype(str)
+        if len(self.ids) == 0:
+            return np.full(len(probes), "", dtype=str)
+
+        positions = np.searchsorted(self.ids, probes)
+        positions[positions == len(self.ids)] = 0
+        found = self.ids[positions] == probes
+        values = self.annotations[field][positions]
+        return np.where(found, values, "")
+
+    def __len__(self) -> int:
+        """Number of probes"""
+        return len(self.ids)
+
+    def __repr__(self) -> str:
+        """Return string representation of ProbeIndex class"""
+        return f"{self.__class__.__name__}({len(self)} probes)"
+
+
+def _strings(values: pd.Series) -> np.ndarray:
+    """Convert a column to strings, with "" for missing values"""
+    out = np.full(len(values), "", dtype=object)
+    present = values.notna().to_numpy()
+    kept = values[present]
+    if kept.dtype.kind == "f" and (kept % 1 == 0).all():
+        kept = kept.astype(np.int64)
+    out[present] = kept.astype(str).to_numpy()
+    return out
+
+
+def probeindex(acc: str, datadir: str | Path = "") -> ProbeIndex:
+    """
+    Get the probe annotation index of a platform, building it if needed.
+
+    The index is built once from the GPL table and stored in the cache
+    (`infoml.binf.cache.CACHE`), keyed by the fingerprint of the GPL file,
+    so every dataset and process using the platform shares it.
+
+    Parameters
+    ----------
+    acc : str
+        GPL accession
+    datadir : str | Path, optional
+        Directory of the downloaded GPL file, see `geodlparse`
+
+    Returns
+    -------
+    ProbeIndex
+        Memory-mapped index of the platform
+    """
+
+    acc = acc.upper()
+    assert acc.startswith("GPL"), "acc must be a GPL accession"
+    geofile = _geofile(acc, Path(datadir or CONFIG.tempdir()))
+
+    with FileLock(CACHE.root / f"{acc}.probes.lock"):
+        source = geofile if geofile.is_file() else None
+        path = CACHE.get(acc, source, ".probes")
+        if path is not None:
+            return ProbeIndex.load(path)
+
+        keep = ["ID"] + [c for names in ProbeIndex.FIELDS.values() for c in names]
+        gpl = geodlparse(acc, datadir, columns=keep)
+        if gpl is None:
+            raise ValueError(f"Could not download or parse {acc}")
+        path = CACHE.path(acc, geofile, ".probes")
+        ProbeIndex.from_table(gpl.table).save(path)
+        CACHE.add(acc, path, geofile)
+        return ProbeIndex.load(path)
+
+
+def read_cumida(
+    path: str | Path, mmap: bool = False, order: str = "F"
+) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Read a CuMiDa CSV file as a float32 matrix.
+
+    The first read parses the CSV with explicit float32 types (with pyarrow's
+    multithreaded reader if it is installed, e.g. with the `arrow` extra)
+    and writes a binary copy next to it: the values as a column-major `.npy`
+    file and the sample, label and gene names as `.json`. Later reads load
+    the binary copy, which is rebuilt if the CSV changes.
+
+    With `order="C"` a row-major copy (`.rows.npy`) is also written, block by
+    block from the column-major one, and read instead. It suits reading the
+    samples a few at a time, since each sample is then contiguous.
+
+    Parameters
+    ----------
+    path : str | Path
+        Path to the CSV file
+    mmap : bool, optional
+        Whether to memory-map the values (read-only) instead of reading them
+        into memory, by default False
+    order : str, optional
+        Layout of the values, "F" (column-major, contiguous genes) or "C"
+        (row-major, contiguous samples), by default "F"
+
+    Returns
+    -------
+    tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]
+        Values (samples x genes), sample names, labels and gene names
+    """
+
+    assert order in ("F", "C"), "order must be 'F' or 'C'"
+    path = Path(path).resolve()
+    binary, meta = path.with_suffix(".npy"), path.with_suffix(".json")
+    rows = path.with_suffix(".rows.npy")
+    stat = path.stat()
+    source = {"size": stat.st_size, "mtime": stat.st_mtime_ns}
+
+    # Only one process converts a file; the others wait and read the copy
+    with FileLock(path.with_suffix(".lock")):
+        info = _readjson(meta)
+        if (
+            info.get("version") != CUMIDA_FORMAT
+            or info.get("source") != source
+            or not binary.is_file()
+        ):
+            values, info = _readcsv(path)
+            info = {"version": CUMIDA_FORMAT, "source": source, **info}
+            temp = binary.with_name(f"{binary.name}.{os.getpid()}.tmp")
+            with open(temp, "wb") as f:
+                np.save(f, np.asfortranarray(values))
+            del values
+            rows.unlink(missing_ok=True)
+            os.replace(temp, binary)
+            _writejson(meta, info)
+
+        if order == "C" and not rows.is_file():
+            _transpose(binary, rows)
+
+    return (
+        np.load(rows if order == "C" else binary, mmap_mode="r" if mmap else None),
+        np.asarray(info["samples"]),
+        np.asarray(info["labels"]),
+        np.asarray(info["genes"], dtype=object),
+    )
+
+
+def _transpose(source: Path, target: Path, block: int = 64 * 2**20) -> None:
+    """Write a row-major copy of a column-major `.npy` file in blocks of rows"""
+
+    values = np.load(source, mmap_mode="r")
+    temp = target.with_name(f"{target.name}.{os.getpid()}.tmp")
+    out = np.lib.format.open_memmap(
+        temp, mode="w+", dtype=values.dtype, shape=values.shape
+    )
+    step = max(1, block // max(1, values.shape[1] * values.itemsize))
+    for start in range(0, values.shape[0], step):
+        out[start : start + step] = values[start : start + step]
+    out.flush()
+    del out, values
+    os.replace(temp, target)
+
+
+def _readcsv(path: Path) -> tuple[np.ndarray, dict]:
+    """Parse a CuMiDa CSV file into float32 values and index lists"""
+
+    header = pd.read_csv(path, nrows=0).columns
+    genes = [i for i, c in enumerate(header) if c not in ("samples", "type")]
+
+    try:
+        from pyarrow import csv as pacsv
+        import pyarrow as pa
+    except ImportError:
+        pacsv = None
+
+    if pacsv is not None:
+        types = {header[i]: pa.float32() for i in genes}
+        table = pacsv.read_csv(
+            path, convert_options=pacsv.ConvertOptions(column_types=types)
+        )
+        values = np.empty((table.num_rows, len(genes)), dtype=np.float32, order="F")
+        for j, i in enumerate(genes):
+            values[:, j] = table.column(i).to_numpy()
+        samples = table.column("samples").to_pylist()
+        labels = table.column("type").to_pylist()
+    else:
+        data = pd.read_csv(path, dtype={header[i]: np.float32 for i in genes})
+        values = data.iloc[:, genes].to_numpy(dtype=np.float32)
+        samples = data["samples"].tolist()
+        labels = data["type"].tolist()
+
+    return values, {
+        "samples": samples,
+        "labels": labels,
+        "genes": [str(header[i]) for i in genes],
+    }
+
+
+def column_stats(
+    values: np.ndarray, block_size: int = 4 * 2**20, ddof: int = 1
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Compute the mean and variance of each column, one block of columns at a
+    time.
+
+    Each block is copied into one float64 buffer and its deviations are
+    squared in place, so at most about `block_size` bytes are held at once
+    whatever the size of `values`. Blocks of columns are contiguous in
+    column-major arrays such as the binary copies of CuMiDa datasets (see
+    `read_cumida`). Missing values (NaN) are ignored.
+
+    Parameters
+    ----------
+    values : np.ndarray
+        Matrix (samples x genes), in memory or memory-mapped
+    block_size : int, optional
+        Bytes of float64 working memory per block, by default 4 MiB. A block
+        always holds at least one column.
+    ddof : int, optional
+        Delta degrees of freedom of the variance, by default 1
+
+    Returns
+    -------
+    tuple[np.ndarray, np.ndarray]
+        Mean and variance of each column, as float64. They are NaN for
+        columns with too few values.
+    """
+
+    assert values.ndim == 2, "values must be a 2D array"
+    assert isinstance(block_size, int) and block_size > 0, "block_size must be > 0"
+
+    n, ncols = values.shape
+    mean = np.full(ncols, np.nan)
+    var = np.full(ncols, np.nan)
+    step = min(ncols, max(1, block_size // max(1, n * 8)))
+    buffer = np.empty((n, step), order="F")
+    for start in range(0, ncols if n else 0, step):
+        block = buffer[:, : min(step, ncols - start)]
+        np.copyto(block, values[:, start : start + step])
+        missing = np.isnan(block)
+        counts = n - missing.sum(axis=0)
+        block[missing] = 0.0
+        with np.errstate(divide="ignore", invalid="ignore"):
+            block_mean = block.sum(axis=0) / counts
+            block -= block_mean
+            block[missing] = 0.0
+            np.square(block, out=block)
+            block_var = block.sum(axis=0) / (counts - ddof)
+        mean[start : start + step] = block_mean
+        var[start : start + step] = np.where(counts > ddof, block_var, np.nan)
+
+    return mean, var
+
+
+def top_variance(
+    values: np.ndarray, k: int, block_size: int = 4 * 2**20
+) -> np.ndarray:
+    """
+    Select the columns with the highest variance.
+
+    Parameters
+    ----------
+    values : np.ndarray
+        Matrix (samples x genes), in memory or memory-mapped
+    k : int
+        Number of columns to select
+    block_size : int, optional
+        Bytes of working memory, see `column_stats`, by default 4 MiB
+
+    Returns
+    -------
+    np.ndarray
+        Indexes of the selected columns, in increasing order. Columns with
+        undefined variance are picked last.
+    """
+
+    assert isinstance(k, int) and k > 0, "k must be a positive int"
+
+    _, var = column_stats(values, block_size)
+    if k >= len(var):
+        return np.arange(len(var))
+    var = np.nan_to_num(var, nan=-np.inf)
+    return np.sort(np.argpartition(-var, k - 1)[:k])
+
+
+def probe_matrix(names: np.ndarray) -> tuple[np.ndarray, sparse.csc_matrix]:
+    """
+    Build the sparse aggregation matrix from probes to genes.
+
+    Parameters
+    ----------
+    names : np.ndarray
+        Gene of each probe
+
+    Returns
+    -------
+    tuple[np.ndarray, sparse.csc_matrix]
+        The sorted unique genes and a (probes x genes) float32 matrix whose
+        column for a gene holds 1 / (number of its probes) at each probe, so
+        that `values @ matrix` averages the probes of every gene. The row
+        indexes of each column list the probes of that gene.
+    """
+
+    genes, groups = np.unique(np.asarray(names), return_inverse=True)
+    counts = np.bincount(groups)
+    matrix = sparse.csc_matrix(
+        (
+            (1 / counts[groups]).astype(np.float32),
+            (np.arange(len(groups)), groups),
+        ),
+        shape=(len(groups), len(genes)),
+    )
+    matrix.sort_indices()
+    return genes, matrix
+
+
+def collapse_probes(
+    values: np.ndarray, matrix: sparse.csc_matrix, method: str = "mean"
+) -> np.ndarray:
+    """
+    Collapse the probes (columns) of a matrix into genes.
+
+    Parameters
+    ----------
+    values : np.ndarray
+        Matrix (samples x probes), in memory or memory-mapped
+    matrix : sparse.csc_matrix
+        Aggregation matrix built by `probe_matrix`
+    method : str, optional
+        How to combine the probes of a gene, by default "mean"
+
+        - "mean": average of the probes, as one sparse matrix product
+        - "max": maximum of the probes
+        - "median": median of the probes
+        - "maxvar": the probe with the highest variance across samples
+
+    Returns
+    -------
+    np.ndarray
+        Matrix (samples x genes)
+    """
+
+    assert method in COLLAPSE, f"method must be one of {COLLAPSE}"
+    assert values.shape[1] == matrix.shape[0], "values do not match the matrix"
+
+    dtype = np.result_type(values.dtype, np.float32)
+    if method == "mean":
+        return np.asarray((matrix.T @ np.asarray(values).T).T, dtype=dtype)
+
+    # Columns grouped by gene, and the start of each group
+    probes, starts = matrix.indices, matrix.indptr[:-1]
+    if method == "max":
+        return np.maximum.reduceat(values[:, probes], starts, axis=1)
+    if method == "maxvar":
+        _, var = column_stats(values)
+        var = np.nan_to_num(var[probes], nan=-np.inf)
+        groups = np.repeat(np.arange(len(starts)), np.diff(matrix.indptr))
+        order = np.lexsort((-var, groups))
+        return np.asarray(values[:, probes[order[starts]]])
+
+    # The median is taken over all the genes with the same number of probes
+    sizes = np.diff(matrix.indptr)
+    out = np.empty((values.shape[0], len(sizes)), dtype=dtype)
+    for size in np.unique(sizes):
+        genes = np.flatnonzero(sizes == size)
+        columns = probes[starts[genes, None] + np.arange(size)]
+        out[:, genes] = np.median(
+            values[:, columns.ravel()].reshape(-1, *columns.shape), axis=2
+        )
+    return out
+
+
+class SampleBatches:
+    """
+    Mini-batches of samples from one or more CuMiDa datasets.
+
+    The datasets are memory-mapped from their row-major copies and read
+    chunk by chunk, so each read only touches the pages of its own samples.
+    Peak memory is about `chunk_size + batch_size` samples of every gene,
+    plus one more chunk when samples are shuffled or columns realigned; it
+    does not depend on the size of the datasets. Each batch is a
+    C-contiguous float32 array of samples with the class codes of its
+    labels. Labels are encoded once, against the classes of all the
+    datasets.
+
+    Attributes
+    ----------
+    classes : np.ndarray
+        Sorted class labels; batch labels are indexes into this array
+    genes : pd.Index
+        Gene (probe) names of the columns
+    batch_size : int
+        Number of samples per batch; the last batch may be smaller
+    shuffle : bool
+        Whether chunks and the samples within them are shuffled
+    chunk_size : int
+        Number of samples read from a dataset at once
+
+    Examples
+    --------
+    >>> batches = cumida.iter_batches(cumida.query(platform="GPL570"), 128)
+    >>> for X, y in batches:
+    ...     model.partial_fit(X, y, classes=np.arange(len(batches.classes)))
+    """
+
+    def __init__(
+        self,
+        values: list[np.ndarray],
+        labels: list[np.ndarray],
+        columns: list[np.ndarray | None],
+        genes: pd.Index,
+        batch_size: int = 256,
+        shuffle: bool = False,
+        chunk_size: int | None = None,
+        seed: int | None = None,
+    ) -> None:
+        """
+        Initialize the iterator.
+
+        Parameters
+        ----------
+        values : list[np.ndarray]
+            Matrix (samples x genes) of each dataset
+        labels : list[np.ndarray]
+            Labels of the samples of each dataset
+        columns : list[np.ndarray | None]
+            Columns of each matrix to read, in the order of `genes`, or None
+            to read them all
+        genes : pd.Index
+            Gene names of the batches
+        batch_size : int, optional
+            Number of samples per batch, by default 256
+        shuffle : bool, optional
+            Whether to shuffle chunks and the samples within them, by default
+            False
+        chunk_size : int, optional
+            Number of samples read at once, by default 4 batches
+        seed : int, optional
+            Seed for shuffling
+        """
+
+        assert (
+            isinstance(batch_size, int) and batch_size > 0
+        ), "batch_size must be a positive int"
+        chunk_size = 4 * batch_size if chunk_size is None else chunk_size
+        assert (
+            isinstance(chunk_size, int) and chunk_size > 0
+        ), "chunk_size must be a positive int"
+
+        self.values = values
+        self.columns = columns
+        self.genes = genes
+        self.batch_size = batch_size
+        self.shuffle = shuffle
+        self.chunk_size = chunk_size
+        self._rng = np.random.default_rng(seed)
+
+        # Encode the labels once
+        self.classes = np.unique(np.concatenate(labels))
+        self.codes = [np.searchsorted(self.classes, y) for y in labels]
+
+    def __len__(self) -> int:
+        """Number of batches"""
+
+        return -(-sum(len(x) for x in self.values) // self.batch_size)
+
+    def _chunks(self) -> Iterator[tuple[np.ndarray, np.ndarray]]:
+        """Read the datasets chunk by chunk"""
+
+        chunks = [
+            (i, start)
+            for i, x in enumerate(self.values)
+            for start in range(0, len(x), self.chunk_size)
+        ]
+        if self.shuffle:
+            chunks = [chunks[j] for j in self._rng.permutation(len(chunks))]
+
+        for i, start in chunks:
+            stop = start + self.chunk_size
+            X = np.asarray(self.values[i][start:stop], dtype=np.float32)
+            if self.columns[i] is not None:
+                # Only the rows of this chunk are copied
+                X = X[:, self.columns[i]]
+            y = self.codes[i][start:stop]
+            if self.shuffle:
+                order = self._rng.permutation(len(y))
+                X, y = X[order], y[order]
+            yield X, y
+
+    def __iter__(self) -> Iterator[tuple[np.ndarray, np.ndarray]]:
+        """
+        Yield batches of samples.
+
+        Yields
+        ------
+        tuple[np.ndarray, np.ndarray]
+            Samples (batch_size x genes) and their class codes
+        """
+
+        pending, size = [], 0
+        for X, y in self._chunks():
+            start = 0
+            while start < len(y):
+                stop = start + min(self.batch_size - size, len(y) - start)
+                pending.append((X[start:stop], y[start:stop]))
+                size += stop - start
+                start = stop
+                if size == self.batch_size:
+                    yield self._batch(pending)
+                    pending, size = [], 0
+        if pending:
+            yield self._batch(pending)
+
+    @staticmethod
+    def _batch(pending: list) -> tuple[np.ndarray, np.ndarray]:
+        """Join the pieces of a batch into contiguous arrays"""
+
+        if len(pending) == 1:
+            X, y = pending[0]
+        else:
+            X = np.concatenate([x for x, _ in pending])
+            y = np.concatenate([y for _, y in pending])
+        return np.ascontiguousarray(X, dtype=np.float32), np.ascontiguousarray(y)
 
 
 class CuMiDa:
@@ -155,21 +1684,27 @@ class CuMiDa:
     BASEURL : str
         Base URL for downloading datasets from CuMiDa.
     index : pd.DataFrame
-        Index of all datasets available from CuMiDa.
+        Index of all datasets available from CuMiDa, loaded on first use.
     datadir : str | Path
         Directory for storing downloaded data.
     gse_dir : str | Path
         Directory for storing downloaded GSE data.
     gpl_dir : str | Path
         Directory for storing downloaded GPL data.
+    errors : dict
+        Errors raised by the last call to `download`, keyed by file name
+        (GSEs) or accession (GPLs).
 
     Methods
     -------
-    download(acc: str, datadir: str | Path='', silent: bool=False,
-             make_dir: bool=False)
+    query(type=None, platform=None, min_samples=None, ...) -> pd.DataFrame
+        Select datasets from the catalog.
+    download(selected: pd.DataFrame | tuple | list, max_connections: int=4)
         Download a dataset from CuMiDa.
-    load(dataset: tuple)
+    load(dataset: tuple, probe_ids: bool=False, mmap: bool=False, ...)
         Load a specified dataset, along with gene annotations from its GPL.
+    iter_batches(selected, batch_size: int=256, shuffle: bool=False, ...)
+        Iterate over datasets in mini-batches of samples.
     """
 
     INDEX = (
@@ -202,8 +1737,9 @@ class CuMiDa:
             os.makedirs(datadir)
         self.datadir = datadir.resolve()
 
-        # Retrieve the index of datasets
-        self._makeindex()
+        # The index of datasets is loaded on first use
+        self._catalog = None
+        self._index = None
 
         # Create subdirectory for gene expression matrices and platforms
         self.gse_dir = self.datadir / "GSE"
@@ -212,150 +1748,500 @@ class CuMiDa:
             os.makedirs(self.gse_dir)
         if not os.path.exists(self.gpl_dir):
             os.makedirs(self.gpl_dir)
+        self._probes = dict()
+        self._collapse = dict()
+
+    @property
+    def index(self) -> pd.DataFrame:
+        """Index of all datasets available from CuMiDa, loaded on first use"""
+
+        if self._index is None:
+            self._index = self.query()
+        return self._index
 
-    def _makeindex(self) -> None:
+    def _makeindex(self) -> Path:
         """
-        Create a dataframe containing the index of all datasets
-        available from CuMiDa.
+        Build the catalog of datasets available from CuMiDa.
+
+        The JSON index is stored as an SQLite table with indexes on the
+        columns used for filtering. It is rebuilt only when the downloaded
+        JSON file changes, and is checked at most once per instance.
         """
 
+        if self._catalog is not None:
+            return self._catalog
+        catalog = self.datadir / "datasets.db"
+
         # Download the index
-        file = (self.datadir / "datasets.json").resolve().__str__()
-        downloadurl(self.INDEX, file, progress=False)
-
-        # Load the dataset index
-        with open(self.datadir / "datasets.json", "rb") as f:
-            self.index = pd.DataFrame(json.load(f))
-
-        # Clean up the columns
-        self.index["ID"] = "GSE" + self.index["gse"].astype(str)
-        self.index["Platform"] = "GPL" + self.index["platform"].astype(str)
-        self.index["URL"] = (
-            self.BASEURL + self.index["downloads"].apply(pd.Series)["csv"]
-        )
-        self.index = (
-            self.index.rename(
-                columns={
-                    "type": "Type",
-                    "classes": "Classes",
-                    "samples": "Samples",
-                    "genes": "Genes",
-                    "manufacturer": "Manufacturer",
-                }
-            )[
-                [
-                    "ID",
-                    "Platform",
-                    "Manufacturer",
-                    "Type",
-                    "Classes",
-                    "Samples",
-                    "Genes",
-                    "URL",
+        file = self.datadir / "datasets.json"
+        downloadurl(self.INDEX, file.resolve().__str__(), progress=False)
+        stat = file.stat()
+        source = json.dumps([CATALOG_FORMAT, stat.st_size, stat.st_mtime_ns])
+
+        with FileLock(self.datadir / "datasets.lock"):
+            if catalog.is_file():
+                with closing(sqlite3.connect(catalog)) as conn:
+                    try:
+                        (stored,) = conn.execute("SELECT source FROM meta").fetchone()
+                    except (sqlite3.Error, TypeError):
+                        stored = None
+                if stored == source:
+                    self._catalog = catalog
+                    return catalog
+
+            # Load the dataset index
+            with open(file, "rb") as f:
+                rows = [
+                    (
+                        f"GSE{x['gse']}",
+                        x["type"],
+                        f"GPL{x['platform']}",
+                        x["manufacturer"],
+                        x["classes"],
+                        x["samples"],
+                        x["genes"],
+                        self.BASEURL + x["downloads"]["csv"],
+                    )
+                    for x in json.load(f)
                 ]
-            ]
-            .sort_values(by=["Platform", "Type"])
-            .set_index(["ID", "Type"])
-        )
-        self._downloads = self.index["URL"].to_dict()
 
-    def download(self, selected: pd.DataFrame | tuple | list) -> None:
+            # Write the catalog to a temporary file and swap it in
+            temp = catalog.with_name(f"{catalog.name}.{os.getpid()}.tmp")
+            temp.unlink(missing_ok=True)
+            with closing(sqlite3.connect(temp)) as conn:
+                conn.executescript(
+                    """
+                    CREATE TABLE datasets (
+                        ID TEXT, Type TEXT, Platform TEXT, Manufacturer TEXT,
+                        Classes INTEGER, Samples INTEGER, Genes INTEGER,
+                        URL TEXT, PRIMARY KEY (ID, Type)
+                    );
+                    CREATE INDEX datasets_platform ON datasets (Platform);
+                    CREATE INDEX datasets_type ON datasets (Type);
+                    CREATE INDEX datasets_samples ON datasets (Samples);
+                    CREATE INDEX datasets_genes ON datasets (Genes);
+                    CREATE TABLE meta (source TEXT);
+                    """
+                )
+                conn.executemany(
+                    "INSERT OR REPLACE INTO datasets VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    rows,
+                )
+                conn.execute("INSERT INTO meta VALUES (?)", (source,))
+                conn.commit()
+            os.replace(temp, catalog)
+
+        self._catalog = catalog
+        return catalog
+
+    def query(
+        self,
+        type: str | list | None = None,
+        platform: str | list | None = None,
+        min_samples: int | None = None,
+        max_samples: int | None = None,
+        min_genes: int | None = None,
+        max_genes: int | None = None,
+    ) -> pd.DataFrame:
+        """
+        Select datasets from the catalog.
+
+        Filters are evaluated by SQLite on the indexed catalog, so only the
+        matching rows are loaded.
+
+        Parameters
+        ----------
+        type : str | list, optional
+            Cancer type(s) of the datasets, e.g. "Breast"
+        platform : str | list, optional
+            Platform accession(s) of the datasets, e.g. "GPL570"
+        min_samples, max_samples : int, optional
+            Bounds (inclusive) on the number of samples
+        min_genes, max_genes : int, optional
+            Bounds (inclusive) on the number of genes
+
+        Returns
+        -------
+        pd.DataFrame
+            The selected rows of `self.index`, which can be passed on to
+            `download`
+
+        Examples
+        --------
+        >>> cumida = CuMiDa()
+        >>> breast = cumida.query(type="Breast", platform="GPL570", min_samples=100)
+        >>> cumida.download(breast)
+        """
+
+        # Build the WHERE clause
+        where, args = ["1"], []
+        for column, value in (("Type", type), ("Platform", platform)):
+            if value is None:
+                continue
+            values = [value] if isinstance(value, str) else list(value)
+            where.append(f"{column} IN ({', '.join('?' * len(values))})")
+            args += values
+        for column, op, value in (
+            ("Samples", ">=", min_samples),
+            ("Samples", "<=", max_samples),
+            ("Genes", ">=", min_genes),
+            ("Genes", "<=", max_genes),
+        ):
+            if value is not None:
+                assert isinstance(value, int), f"{column} bounds must be ints"
+                where.append(f"{column} {op} ?")
+                args.append(value)
+
+        with closing(sqlite3.connect(self._makeindex())) as conn:
+            index = pd.read_sql_query(
+                "SELECT ID, Platform, Manufacturer, Type, Classes, Samples, Genes, "
+                f"URL FROM datasets WHERE {' AND '.join(where)} "
+                "ORDER BY Platform, Type, rowid",
+                conn,
+                params=args,
+            )
+        return index.set_index(["ID", "Type"])
+
+    def _lookup(self, datasets: list) -> list[tuple[str, str]]:
+        """Return the (Platform, URL) of each (ID, Type) in `datasets`"""
+
+        found = []
+        with closing(sqlite3.connect(self._makeindex())) as conn:
+            for dataset in datasets:
+                row = conn.execute(
+                    "SELECT Platform, URL FROM datasets WHERE ID = ? AND Type = ?",
+                    tuple(dataset),
+                ).fetchone()
+                if row is None:
+                    raise KeyError(dataset)
+                found.append(row)
+        return found
+
+    def download(
+        self, selected: pd.DataFrame | tuple | list, max_connections: int = 4
+    ) -> None:
         """
         Download selected datasets from CuMiDa.
 
+        GSE matrices and GPL platforms are fetched concurrently by a pool of
+        `max_connections` workers. An error in one download does not cancel
+        the others; failed items are reported and stored in `self.errors`.
+
         Parameters
         ----------
         selected : pd.DataFrame | tuple
             A subset of `self.index` containing the datasets to download.
             Or a tuple of (ID, Type) for a single dataset or a list of tuples.
+        max_connections : int, optional
+            Maximum number of simultaneous downloads, by default 4
 
         Returns
         -------
         None
         """
 
+        assert isinstance(max_connections, int), "max_connections must be an int"
+        assert max_connections > 0, "max_connections must be positive"
+
+        if isinstance(selected, pd.DataFrame):
+            self._selected = selected.index.to_list()
+        elif isinstance(selected, tuple):
+            self._selected = [selected]
+        elif isinstance(selected, list):
+            self._selected = selected
+        else:
+            raise TypeError("selected must be a DataFrame or tuple")
         try:
-            if isinstance(selected, pd.DataFrame):
-                urls = [self._downloads[x] for x in selected.index]
-                self._selected = selected.index.to_list()
-            elif isinstance(selected, tuple):
-                urls = [self._downloads[selected]]
-                self._selected = [selected]
-            elif isinstance(selected, list):
-                urls = [self._downloads[x] for x in selected]
-                self._selected = selected
-            else:
-                raise TypeError("selected must be a DataFrame or tuple")
+            platforms, urls = zip(*self._lookup(self._selected))
         except KeyError:
             raise KeyError("Dataset not found in CuMiDa index")
 
-        # Download the GSE matrices from CuMiDa
         self.file_paths = [
             self.gse_dir / re.search(r"\w+\.csv", x)[0] for x in urls  # type: ignore
         ]
-        if len(self.file_paths) > 1:
-            with tqdm(total=len(urls), desc="Downloading GSEs") as pbar:
-                for url, file in zip(urls, self.file_paths):
-                    downloadurl(url, file.__str__(), progress=False)
-                    pbar.update(1)
-        else:
-            downloadurl(urls[0], self.file_paths[0].__str__(), progress=False)
+        self._gpl_accs = np.unique(platforms)
 
-        # Download the GPLs from GEO
-        self._gpl_accs = np.unique(
-            [self.index.loc[x]["Platform"] for x in self._selected]
-        )
-        self._gpls = dict()
-        with tqdm(total=len(self._gpl_accs), desc="Downloading GPLs") as pbar:
+        # Download the GPLs from GEO and the GSE matrices from CuMiDa
+        # GPLs are submitted first since their probe indexes are also built
+        jobs = dict()
+        with ThreadPoolExecutor(max_workers=max_connections) as pool:
             for acc in self._gpl_accs:
-                self._gpls[acc] = geodlparse(acc, self.gpl_dir.__str__(), silent=True)
-                pbar.update(1)
+                jobs[acc] = pool.submit(probeindex, acc, self.gpl_dir.__str__())
+            for url, file in zip(urls, self.file_paths):
+                jobs[file.name] = pool.submit(
+                    downloadurl, url, file.__str__(), progress=False
+                )
+
+            with tqdm(total=len(jobs), desc="Downloading datasets") as pbar:
+                for _ in as_completed(jobs.values()):
+                    pbar.update(1)
+
+        # Collect results in submission order
+        self.errors = dict()
+        for key, job in jobs.items():
+            error = job.exception()
+            if error is None and key in self._gpl_accs:
+                self._probes[key] = job.result()
+            if error is not None:
+                self.errors[key] = error
+                print(f"[bold red]Error[/bold red]: {key} failed.", f"\n\n{error}")
 
-    def load(self, dataset: tuple, probe_ids: bool = False) -> pd.DataFrame:
+    def load(
+        self,
+        dataset: tuple,
+        probe_ids: bool = False,
+        mmap: bool = False,
+        top_genes: int | None = None,
+        collapse: str | None = None,
+    ) -> pd.DataFrame | tuple[np.ndarray, pd.Index, pd.Index, pd.Index]:
         """
         Load a specified dataset.
 
+        Values are read as float32 with `read_cumida`, which keeps a binary
+        copy next to the CSV file so that only the first load parses it. The
+        loaded table is also kept in memory, so loading the same dataset
+        again (from any instance) does not read it again. The values of the
+        returned table can then be shared with the cache, in which case they
+        are read-only; use `gse.copy()` to modify them. Probe IDs are
+        mapped to GenBank accessions with the platform's `ProbeIndex`, which
+        is built once per platform and shared through the cache.
+
+        With `mmap=True` the values are memory-mapped from the binary copy
+        instead, so processes loading the same dataset share its pages. The
+        genes are then left in file order rather than sorted.
+
+        With `top_genes`, the variance of every gene is computed over blocks
+        of the memory-mapped values and only the `top_genes` most variable
+        genes are read into memory. In this case the values are never
+        memory-mapped, even with `mmap=True`.
+
+        With `collapse`, the probes of each GenBank accession are combined
+        into one column (see `collapse_probes`) instead of being numbered.
+        The aggregation matrix is built once per platform and probe layout,
+        so collapsing a dataset costs one sparse product or group reduction.
+
         Parameters
         ----------
         dataset : tuple
             A tuple of (ID, Type) for a single dataset.
         probe_ids : bool, optional
             If true, return the probe IDs instead of the GenBank Accessions.
+        mmap : bool, optional
+            If true, return a read-only memory-mapped array with its indexes
+            instead of a DataFrame, by default False
+        top_genes : int, optional
+            Number of genes with the highest variance to keep, by default all
+        collapse : str, optional
+            Method for combining the probes of a gene, one of "mean", "max",
+            "median" or "maxvar", by default None (keep every probe)
 
         Returns
         -------
         gse : pd.DataFrame
+            If `mmap` is False
+        tuple[np.ndarray, pd.Index, pd.Index, pd.Index]
+            The values (samples x genes), sample names, labels and gene names,
+            if `mmap` is True
+
+        Examples
+        --------
+        >>> X, samples, labels, genes = cumida.load(("GSE45827", "Breast"), mmap=True)
         """
 
         # Check inputs
         assert isinstance(dataset, tuple), "dataset must be a tuple"
         assert len(dataset) == 2, "dataset must be a tuple of (ID, Type)"
-        assert dataset in self.index.index, "dataset not found in CuMiDa index"
+        assert (
+            collapse is None or collapse in COLLAPSE
+        ), f"collapse must be in {COLLAPSE}"
+        try:
+            ((platform, _),) = self._lookup([dataset])
+        except KeyError:
+            raise AssertionError("dataset not found in CuMiDa index")
 
-        # Load the GSE
+        # Map the binary copy of the GSE
         path = self.gse_dir / f"{'_'.join(dataset[::-1])}.csv"
-        gse = pd.read_csv(path).set_index(["samples", "type"])
+        if mmap:
+            values, samples, labels, genes = read_cumida(path, mmap=True)
+            if top_genes is not None:
+                columns = top_variance(values, top_genes)
+                values, genes = np.array(values[:, columns]), genes[columns]
+            if not probe_ids and collapse is not None:
+                collapsed = self._collapse_probes(
+                    dataset[0], platform, values, genes.astype(str), collapse
+                )
+                if collapsed is not None:
+                    values, genes = collapsed
+            elif not probe_ids:
+                genes = self._genbank(dataset[0], platform, genes.astype(str))
+            return (
+                values,
+                pd.Index(samples, name="samples"),
+                pd.Index(labels, name="type"),
+                pd.Index(genes),
+            )
 
-        # Rename the columns
-        if not probe_ids:
-            try:
-                # Rename GSE columns with GenBank IDs where possible
-                gpl = self._gpls[self.index.loc[dataset]["Platform"]].table
-                gpl["GB_ACC"] = gpl["GB_ACC"].fillna(gpl["ID"])
-                gse.columns = gse.columns.map(gpl.set_index("ID")["GB_ACC"])
+        # Load the GSE, reusing the table parsed earlier in this process
+        stat = path.stat()
+        key = ("CuMiDa", str(path), stat.st_size, stat.st_mtime_ns, top_genes)
+        gse = MEMO.get(key)
+        if gse is None:
+            values, samples, labels, genes = read_cumida(
+                path, mmap=top_genes is not None
+            )
+            if top_genes is not None:
+                columns = top_variance(values, top_genes)
+                values, genes = np.array(values[:, columns]), genes[columns]
+            values.flags.writeable = False
+            index = pd.MultiIndex.from_arrays(
+                [samples, labels], names=["samples", "type"]
+            )
+            gse = pd.DataFrame(values, index=index, columns=genes)
+            MEMO.put(key, gse)
 
-                # Add numeric suffices to duplicate column names
-                idx = gse.columns.to_series().groupby(level=0).transform("cumcount")
-                gse.columns = gse.columns + "." + idx.astype(str)
+        # Collapse the probes of each gene into a new table
+        if not probe_ids and collapse is not None:
+            ids = gse.columns.to_numpy().astype(str)
+            collapsed = self._collapse_probes(
+                dataset[0], platform, gse.to_numpy(), ids, collapse
+            )
+            if collapsed is not None:
+                values, genes = collapsed
+                return pd.DataFrame(values, index=gse.index, columns=genes)
+        gse = gse.copy(deep=False)
 
-                # Sort columns alphabetically
+        # Rename the columns and sort them alphabetically
+        if not probe_ids:
+            ids = gse.columns.to_numpy().astype(str)
+            names = self._genbank(dataset[0], platform, ids)
+            if names is not ids:
+                gse.columns = pd.Index(names)
                 gse = gse.reindex(sorted(gse.columns), axis=1)
-            except KeyError as E:
-                print(f"No GenBank IDs found for {dataset[0]}")
-                print(E)
 
         return gse
 
+    def _genbank(
+        self, gse: str, platform: str, ids: np.ndarray, suffix: bool = True
+    ) -> np.ndarray:
+        """
+        Map the probe IDs of a GSE to GenBank accessions.
+
+        Probes without an accession keep their ID, and unless `suffix` is
+        False every name gets a numeric suffix counting its duplicates. The
+        IDs are returned as-is if the platform has no GenBank accessions.
+        """
+
+        try:
+            # Get the platform index if it was not built by this instance
+            if platform not in self._probes:
+                self._probes[platform] = probeindex(platform, self.gpl_dir.__str__())
+
+            # Rename probes with GenBank IDs where possible
+            probes = self._probes[platform]
+            if not (probes.annotations["gb_acc"] != "").any():
+                raise KeyError("GB_ACC")
+            genbank = probes.lookup(ids, "gb_acc")
+            names = pd.Index(np.where(genbank == "", ids, genbank))
+            if not suffix:
+                return names.to_numpy()
+
+            # Add numeric suffices to duplicate names
+            idx = names.to_series().groupby(level=0).transform("cumcount")
+            return (names + "." + idx.astype(str)).to_numpy()
+        except (KeyError, ValueError) as E:
+            print(f"No GenBank IDs found for {gse}")
+            print(E)
+            return ids
+
+    def _collapse_probes(
+        self, gse: str, platform: str, values: np.ndarray, ids: np.ndarray, method: str
+    ) -> tuple[np.ndarray, np.ndarray] | None:
+        """
+        Collapse the probes of a GSE into GenBank accessions.
+
+        The aggregation matrix is cached by platform and probe IDs. Returns
+        the values and accessions, or None if the platform has none.
+        """
+
+        key = (platform, hashlib.sha1("\t".join(ids).encode()).hexdigest())
+        if key not in self._collapse:
+            names = self._genbank(gse, platform, ids, suffix=False)
+            self._collapse[key] = None if names is ids else probe_matrix(names)
+        if self._collapse[key] is None:
+            return None
+
+        genes, matrix = self._collapse[key]
+        return collapse_probes(values, matrix, method), genes
+
+    def iter_batches(
+        self,
+        selected: pd.DataFrame | tuple | list,
+        batch_size: int = 256,
+        shuffle: bool = False,
+        chunk_size: int | None = None,
+        seed: int | None = None,
+    ) -> SampleBatches:
+        """
+        Iterate over downloaded datasets in mini-batches of samples.
+
+        The datasets are memory-mapped from their row-major copies (see
+        `read_cumida`) and concatenated along their samples. Their columns
+        are aligned on the probe IDs of the first dataset, so they should
+        share a platform.
+
+        Parameters
+        ----------
+        selected : pd.DataFrame | tuple | list
+            A subset of `self.index`, a tuple of (ID, Type) or a list of
+            tuples.
+        batch_size : int, optional
+            Number of samples per batch, by default 256
+        shuffle : bool, optional
+            Whether to shuffle chunks of samples and the samples within them,
+            by default False
+        chunk_size : int, optional
+            Number of samples read at once, by default 4 batches
+        seed : int, optional
+            Seed for shuffling
+
+        Returns
+        -------
+        SampleBatches
+            An iterable of (samples, class codes) batches
+
+        Raises
+        ------
+        ValueError
+            If a dataset lacks some of the probes of the first one
+        """
+
+        if isinstance(selected, pd.DataFrame):
+            selected = selected.index.to_list()
+        elif isinstance(selected, tuple):
+            selected = [selected]
+        assert isinstance(selected, list) and selected, "no datasets selected"
+
+        values, labels, columns, genes = [], [], [], None
+        for dataset in selected:
+            self._lookup([dataset])
+            path = self.gse_dir / f"{'_'.join(dataset[::-1])}.csv"
+            X, _, y, names = read_cumida(path, mmap=True, order="C")
+            if genes is None:
+                genes, cols = pd.Index(names), None
+            elif genes.equals(pd.Index(names)):
+                cols = None
+            else:
+                cols = pd.Index(names).get_indexer(genes)
+                if (cols < 0).any():
+                    raise ValueError(f"{dataset[0]} lacks probes of {selected[0][0]}")
+            values.append(X)
+            labels.append(y)
+            columns.append(cols)
+
+        return SampleBatches(
+            values, labels, columns, genes, batch_size, shuffle, chunk_size, seed
+        )
+
     def __repr__(self) -> str:
         """Return a string representation of the CuMiDa class"""
 
@@ -0,0 +1,271 @@
+"""
+infoml.binf.normalize
+---------------------
+
+This module contains normalization steps for expression matrices (samples x
+genes): log2 transform, quantile normalization and per-gene z-scoring. Each
+step works through the rows in chunks and writes into an output array, which
+can be the input itself, so in-memory and memory-mapped matrices can be
+normalized with at most one extra copy of the data.
+"""
+
+# Imports from standard library
+from typing import Iterator
+
+# Imports from third party packages
+import numpy as np
+
+# Imports from local source
+from .data import column_stats
+
+
+def _output(values: np.ndarray, out: np.ndarray | None) -> np.ndarray:
+    """Check or allocate the output array of a step"""
+
+    assert values.ndim == 2, "values must be a 2D array"
+    if out is None:
+        return np.empty(values.shape, dtype=np.result_type(values.dtype, np.float32))
+    assert out.shape == values.shape, "out must have the same shape as values"
+    assert out.flags.writeable, "out must be writeable"
+    assert np.issubdtype(
+        out.dtype, np.floating
+    ), f"out must have a floating point dtype, not {out.dtype}"
+    return out
+
+
+def _chunks(nrows: int, chunk_size: int) -> Iterator[slice]:
+    """Split the rows of a matrix into chunks"""
+
+    assert isinstance(chunk_size, int) and chunk_size > 0, "chunk_size must be > 0"
+    for start in range(0, nrows, chunk_size):
+        yield slice(start, start + chunk_size)
+
+
+def log2(
+    values: np.ndarray,
+    offset: float = 1.0,
+    out: np.ndarray | None = None,
+    chunk_size: int = 1024,
+) -> np.ndarray:
+    """
+    Compute log2(values + offset).
+
+    Parameters
+    ----------
+    values : np.ndarray
+        Matrix (samples x genes), in memory or memory-mapped
+    offset : float, optional
+        Pseudo-count added before the transform, by default 1.0
+    out : np.ndarray, optional
+        Floating point array to write the result to, which may be `values`
+        itself, by default a new array
+    chunk_size : int, optional
+        Number of rows processed at once, by default 1024
+
+    Returns
+    -------
+    np.ndarray
+        The transformed matrix (`out`)
+    """
+
+    out = _output(values, out)
+    for rows in _chunks(len(values), chunk_size):
+        chunk = out[rows]
+        np.add(values[rows], offset, out=chunk)
+        np.log2(chunk, out=chunk)
+    return out
+
+
+def quantile_normalize(
+    values: np.ndarray, out: np.ndarray | None = None, chunk_size: int = 1024
+) -> np.ndarray:
+    """
+    Quantile normalize the samples (rows) of a matrix.
+
+    A first pass sorts each row and averages the sorted rows into a reference
+    distribution. A second pass replaces each value with the reference value
+    of its rank. Tied values get consecutive ranks rather than their average.
+
+    Missing values (NaN) stay missing. A row with fewer valid values is
+    interpolated onto the quantiles of a full row before it is averaged into
+    the reference, and its ranks are mapped back the same way.
+
+    Parameters
+    ----------
+    values : np.ndarray
+        Matrix (samples x genes), in memory or memory-mapped
+    out : np.ndarray, optional
+        Floating point array to write the result to, which may be `values`
+        itself, by default a new array
+    chunk_size : int, optional
+        Number of rows processed at once, by default 1024
+
+    Returns
+    -------
+    np.ndarray
+        The normalized matrix (`out`)
+    """
+
+    out = _output(values, out)
+    ncols = values.shape[1]
+    quantiles = np.linspace(0, 1, ncols)
+
+    # Average the sorted samples; NaN are sorted last
+    reference, used = np.zeros(ncols), 0
+    for rows in _chunks(len(values), chunk_size):
+        chunk = np.sort(values[rows], axis=1)
+        valid = ncols - np.isnan(chunk).sum(axis=1)
+        full = valid == ncols
+        reference += chunk[full].sum(axis=0)
+        for i in np.flatnonzero(~full & (valid > 0)):
+            m = valid[i]
+            reference += np.interp(quantiles, np.linspace(0, 1, m), chunk[i, :m])
+        used += np.count_nonzero(valid)
+    reference /= max(used, 1)
+
+    # Map each value to the reference value of its rank
+    for rows in _chunks(len(values), chunk_size):
+        x = values[rows]
+        order = np.argsort(x, axis=1)
+        valid = ncols - np.isnan(x).sum(axis=1)
+        chunk = np.empty(order.shape, dtype=out.dtype)
+        np.put_along_axis(chunk, order, reference.astype(out.dtype), axis=1)
+        for i in np.flatnonzero(valid < ncols):
+            m = valid[i]
+            chunk[i, order[i, :m]] = np.interp(
+                np.linspace(0, 1, m), quantiles, reference
+            )
+            chunk[i, order[i, m:]] = np.nan
+        out[rows] = chunk
+    return out
+
+
+def zscore(
+    values: np.ndarray,
+    out: np.ndarray | None = None,
+    ddof: int = 1,
+    chunk_size: int = 1024,
+) -> np.ndarray:
+    """
+    Standardize the genes (columns) of a matrix.
+
+    The mean and variance of each gene are computed block by block with
+    `column_stats`, ignoring missing values (NaN), which stay missing. Genes
+    with zero variance are only centered.
+
+    Parameters
+    ----------
+    values : np.ndarray
+        Matrix (samples x genes), in memory or memory-mapped
+    out : np.ndarray, optional
+        Floating point array to write the result to, which may be `values`
+        itself, by default a new array
+    ddof : int, optional
+        Delta degrees of freedom of the standard deviation, by default 1
+    chunk_size : int, optional
+        Number of rows processed at once, by default 1024
+
+    Returns
+    -------
+    np.ndarray
+        The standardized matrix (`out`)
+    """
+
+    out = _output(values, out)
+
+    mean, var = column_stats(values, ddof=ddof)
+    std = np.sqrt(var)
+    std[~(std > 0)] = 1.0
+    mean, std = mean.astype(out.dtype), std.astype(out.dtype)
+
+    for rows in _chunks(len(values), chunk_size):
+        chunk = out[rows]
+        np.subtract(values[rows], mean, out=chunk)
+        np.divide(chunk, std, out=chunk)
+    return out
+
+
+def normalize(
+    values: np.ndarray,
+    log: bool = True,
+    quantile: bool = True,
+    scale: bool = True,
+    out: np.ndarray | None = None,
+    chunk_size: int = 1024,
+) -> np.ndarray:
+    """
+    Apply log2 transform, quantile normalization and z-scoring, in order.
+
+    The first step writes to `out` and the following steps run in place on
+    it, so memory stays near one copy of the data (none with `out=values`).
+
+    Parameters
+    ----------
+    values : np.ndarray
+        Matrix (samples x genes), in memory or memory-mapped
+    log : bool, optional
+        Whether to apply `log2`, by default True
+    quantile : bool, optional
+        Whether to apply `quantile_normalize`, by default True
+    scale : bool, optional
+        Whether to apply `zscore`, by default True
+    out : np.ndarray, optional
+        Floating point array to write the result to, which may be `values`
+        itself, by default a new array
+    chunk_size : int, optional
+        Number of rows processed at once, by default 1024
+
+    Returns
+    -------
+    np.ndarray
+        The normalized matrix (`out`)
+
+    Examples
+    --------
+    >>> X, samples, labels, genes = cumida.load(("GSE45827", "Breast"), mmap=True)
+    >>> X = normalize(X, log=False)
+    """
+
+    steps = [
+        step
+        for step, enabled in (
+            (log2, log),
+            (quantile_normalize, quantile),
+            (zscore, scale),
+        )
+        if enabled
+    ]
+    if not steps:
+        out = _output(values, out)
+        if out is not values:
+            for rows in _chunks(len(values), chunk_size):
+                out[rows] = values[rows]
+        return out
+
+    for step in steps:
+        out = step(values, out=out, chunk_size=chunk_size)
+        values = out
+    return out
+
+
+if __name__ == "__main__":
+    print("This module is not intended to be run directly.")
+else:
+    # Define module I/O
+    __all__ = [
+        "log2",
+        "quantile_normalize",
+        "zscore",
+        "normalize",
+    ]
+    __all__ += [m for m in dir() if m.startswith("__")]
+
+    def __dir__():
+        """Override default dir() behavior"""
+        return __all__
+
+    def __getattr__(name):
+        """Override default getattr() behavior"""
+        if name not in __all__:
+            raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+        return globals()[name]
@@ -7,17 +7,29 @@ Some of these functions are modified from the bmes package by Dr. Ahmet Sacan.
 """
 
 # Imports from standard library
+from concurrent.futures import ThreadPoolExecutor
 from tempfile import NamedTemporaryFile
 from zipfile import ZipFile as zopen
 from unicodedata import normalize
 from itertools import islice
+from urllib.parse import urlsplit
 from shutil import copyfile
 from pathlib import Path
-import os, platform, re, sqlite3, subprocess
+import asyncio, hashlib, json, os, platform, re, sqlite3, subprocess
+import threading, time, zlib
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    import msvcrt
+
+    fcntl = None
 
 # Imports from third party packages
 from pandas import DataFrame
 from tqdm.auto import tqdm
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from rich import print
 import requests
 
@@ -128,15 +140,451 @@ def slugify(text: str, allow_unicode: bool = False) -> str:
     return re.sub(r"[-\s]+", "-", text)
 
 
+class Transport:
+    """
+    Pooled HTTP transport shared by all downloads
+
+    Each thread keeps one keep-alive `requests.Session` per host, so repeated
+    downloads from the same server reuse their TCP/TLS connections. Requests
+    that fail with a 5xx status or a connection error are retried with
+    exponential backoff.
+
+    Attributes
+    ----------
+    retries : int
+        Number of times a failed request or interrupted transfer is retried
+    backoff : float
+        Base delay in seconds; the n-th retry waits `backoff * 2**n` seconds
+    timeout : tuple
+        (connect, read) timeouts in seconds
+    pool_size : int
+        Number of connections kept alive per host
+    interval : float
+        Minimum number of seconds between progress bar updates
+    min_segment : int
+        Smallest byte range fetched by one connection in segmented downloads
+
+    Methods
+    -------
+    session(url: str) -> requests.Session
+        Get the session used for a URL's host
+    get(url: str, **kwargs) -> requests.Response
+        Send a GET request through the pooled session
+    chunksize(size: int) -> int
+        Choose the streaming chunk size for a download
+    wait(attempt: int) -> None
+        Sleep before retrying a failed transfer
+    close() -> None
+        Close the sessions opened by the current thread
+    """
+
+    STATUS_FORCELIST = (500, 502, 503, 504)
+
+    def __init__(
+        self,
+        retries: int = 3,
+        backoff: float = 0.5,
+        timeout: tuple = (3, 30),
+        pool_size: int = 10,
+        interval: float = 0.2,
+        min_segment: int = 8 * 1024 * 1024,
+    ) -> None:
+        """Initialize Transport class"""
+
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.pool_size = pool_size
+        self.interval = interval
+        self.min_segment = min_segment
+        self._local = threading.local()
+
+    def __repr__(self) -> str:
+        """Return string representation of Transport class"""
+        return f"{self.__class__.__name__}(retries={self.retries})"
+
+    def session(self, url: str) -> requests.Session:
+        """Get the keep-alive session used for a URL's host"""
+
+        sessions = self._local.__dict__.setdefault("sessions", {})
+        host = urlsplit(url).netloc
+        if host not in sessions:
+            retry = Retry(
+                total=self.retries,
+                backoff_factor=self.backoff,
+                status_forcelist=self.STATUS_FORCELIST,
+                allowed_methods=("GET", "HEAD"),
+                raise_on_status=False,
+            )
+            adapter = HTTPAdapter(
+                pool_connections=1, pool_maxsize=self.pool_size, max_retries=retry
+            )
+            session = requests.Session()
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            sessions[host] = session
+        return sessions[host]
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        """Send a GET request through the pooled session"""
+
+        kwargs.setdefault("timeout", self.timeout)
+        kwargs.setdefault("allow_redirects", True)
+        return self.session(url).get(url, **kwargs)
+
+    def chunksize(self, size: int = 0) -> int:
+        """
+        Choose the streaming chunk size for a download
+
+        Uses `CONFIG.chunksize()` if it is set. Otherwise the chunk size is
+        1/256 of the download size, clipped to the range 64 KiB - 4 MiB.
+        """
+
+        if CONFIG.chunksize():
+            return CONFIG.chunksize()
+        return min(max(size // 256, 64 * 1024), 4 * 1024 * 1024)
+
+    def wait(self, attempt: int) -> None:
+        """Sleep before retrying a failed transfer"""
+        time.sleep(self.backoff * 2**attempt)
+
+    def close(self) -> None:
+        """Close the sessions opened by the current thread"""
+
+        for session in self._local.__dict__.pop("sessions", {}).values():
+            session.close()
+
+
+TRANSPORT = Transport()
+
+
+class FileLock:
+    """
+    Exclusive lock shared between processes through a lock file
+
+    Only one process (or thread) can hold the lock on a given path at a time;
+    the others wait until it is released. This is used to make sure a file is
+    only downloaded or built once when many workers ask for it at the same
+    time. The lock file itself is left in place.
+
+    Attributes
+    ----------
+    path : Path
+        Path to the lock file
+    timeout : float | None
+        Seconds to wait for the lock before raising TimeoutError, by default
+        wait forever
+    poll : float
+        Seconds between attempts to take the lock
+
+    Methods
+    -------
+    acquire(blocking: bool=True) -> bool
+        Take the lock
+    acquire_async() -> bool
+        Take the lock without blocking the event loop
+    release() -> None
+        Release the lock
+
+    Examples
+    --------
+    >>> with FileLock(CONFIG.cache() / "GPL570.lock"):
+    ...     gpl = build_expensive_thing()
+    """
+
+    def __init__(
+        self, path: str | Path, timeout: float | None = None, poll: float = 0.1
+    ) -> None:
+        """Initialize FileLock class"""
+        self.path = Path(path)
+        self.timeout = timeout
+        self.poll = poll
+        self._fd = None
+
+    def __enter__(self):
+        """Enter context manager"""
+        self.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        """Exit context manager"""
+        self.release()
+
+    def __repr__(self) -> str:
+        """Return string representation of FileLock class"""
+        return f"{self.__class__.__name__}({self.path})"
+
+    @property
+    def locked(self) -> bool:
+        """Whether this object holds the lock"""
+        return self._fd is not None
+
+    def _trylock(self, fd: int, blocking: bool = False) -> bool:
+        """Try to lock a file descriptor"""
+        try:
+            if fcntl is not None:
+                flags = fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB
+                fcntl.flock(fd, flags)
+            else:
+                msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+        except OSError:
+            return False
+        return True
+
+    def _open(self) -> int:
+        """Open the lock file"""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        return os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+
+    def acquire(self, blocking: bool = True) -> bool:
+        """
+        Take the lock
+
+        Parameters
+        ----------
+        blocking : bool, optional
+            Wait until the lock is free, by default True
+
+        Returns
+        -------
+        bool
+            True if the lock was taken
+
+        Raises
+        ------
+        TimeoutError
+            If the lock could not be taken within `timeout` seconds
+        """
+
+        fd = self._open()
+        start = time.monotonic()
+        wait = blocking and self.timeout is None and fcntl is not None
+        while not self._trylock(fd, blocking=wait):
+            if not blocking:
+                os.close(fd)
+                return False
+            if self.timeout is not None and time.monotonic() - start > self.timeout:
+                os.close(fd)
+                raise TimeoutError(f"Could not lock {self.path}")
+            time.sleep(self.poll)
+        self._fd = fd
+        return True
+
+    async def acquire_async(self) -> bool:
+        """Take the lock, yielding to the event loop while it is held elsewhere"""
+
+        start = time.monotonic()
+        while not self.acquire(blocking=False):
+            if self.timeout is not None and time.monotonic() - start > self.timeout:
+                raise TimeoutError(f"Could not lock {self.path}")
+            await asyncio.sleep(self.poll)
+        return True
+
+    def release(self) -> None:
+        """Release the lock"""
+
+        if self._fd is None:
+            return
+        try:
+            if fcntl is not None:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+            else:
+                os.lseek(self._fd, 0, os.SEEK_SET)
+                msvcrt.locking(self._fd, msvcrt.LK_UNLCK, 1)
+        finally:
+            os.close(self._fd)
+            self._fd = None
+
+
+class StreamTransform:
+    """
+    Base class for transforms applied to the bytes of a download
+
+    `downloadurl` passes every chunk it writes to `update` and calls `close`
+    once the transfer is complete, before the file is renamed into place.
+    Raising an exception in `close` rejects the download. Transforms are only
+    fed from disk when the bytes were not streamed in order (a resumed or
+    segmented transfer, or a cached file that `satisfied` cannot vouch for).
+
+    Methods
+    -------
+    reset() -> None
+        Discard any bytes processed so far
+    update(chunk: bytes) -> None
+        Process the next chunk of the file
+    close() -> None
+        Finish processing the file
+    record(meta: dict) -> None
+        Store results in the file's metadata
+    satisfied(file: Path, meta: dict) -> bool
+        Check if a cached file needs to be processed again
+    """
+
+    def reset(self) -> None:
+        """Discard any bytes processed so far"""
+        pass
+
+    def update(self, chunk: bytes) -> None:
+        """Process the next chunk of the file"""
+        raise NotImplementedError
+
+    def close(self) -> None:
+        """Finish processing the file"""
+        pass
+
+    def record(self, meta: dict) -> None:
+        """Store results in the file's metadata"""
+        pass
+
+    def satisfied(self, file: Path, meta: dict) -> bool:
+        """Check if a cached file needs to be processed again"""
+        return False
+
+
+class Checksum(StreamTransform):
+    """
+    Compute the digest of a download and compare it to an expected value
+
+    Attributes
+    ----------
+    algorithm : str
+        Name of a `hashlib` algorithm, e.g. "md5" or "sha256"
+    expected : str
+        Expected hex digest; no check is made if empty
+    hexdigest : str
+        Hex digest of the file, set when the transform is closed
+
+    Raises
+    ------
+    ValueError
+        If the digest does not match `expected`
+
+    Examples
+    --------
+    >>> md5 = Checksum("md5", "9e107d9d372bb6826bd81d3542a419d6")
+    >>> downloadurl(url, transforms=[md5])
+    """
+
+    def __init__(self, algorithm: str = "sha256", expected: str = "") -> None:
+        """Initialize Checksum class"""
+        self.algorithm = algorithm.lower()
+        self.expected = expected.lower()
+        self.hexdigest = ""
+        self.reset()
+
+    def __repr__(self) -> str:
+        """Return string representation of Checksum class"""
+        return f"{self.__class__.__name__}({self.algorithm!r})"
+
+    def reset(self) -> None:
+        """Start a new digest"""
+        self._hash = hashlib.new(self.algorithm)
+
+    def update(self, chunk: bytes) -> None:
+        """Hash the next chunk of the file"""
+        self._hash.update(chunk)
+
+    def close(self) -> None:
+        """Check the digest of the file"""
+        self.hexdigest = self._hash.hexdigest()
+        self._check()
+
+    def record(self, meta: dict) -> None:
+        """Store the digest in the file's metadata"""
+        meta.setdefault("digests", {})[self.algorithm] = self.hexdigest
+
+    def satisfied(self, file: Path, meta: dict) -> bool:
+        """Use the stored digest of a cached file if there is one"""
+        self.hexdigest = meta.get("digests", {}).get(self.algorithm, "")
+        if self.hexdigest:
+            self._check()
+        return bool(self.hexdigest)
+
+    def _check(self) -> None:
+        """Compare the digest to the expected value"""
+        if self.expected and self.hexdigest != self.expected:
+            raise ValueError(
+                f"{self.algorithm} digest {self.hexdigest} does not match "
+                f"the expected digest {self.expected}"
+            )
+
+
+class Gunzip(StreamTransform):
+    """
+    Write a decompressed copy of a gzip (or zlib) download
+
+    The copy is written to `<dest>.part` and renamed to `dest` once the
+    download is complete. Concatenated gzip members are supported.
+
+    Attributes
+    ----------
+    dest : Path
+        Path to the decompressed file
+    """
+
+    def __init__(self, dest: str | Path) -> None:
+        """Initialize Gunzip class"""
+        self.dest = Path(dest)
+        self._part = self.dest.with_name(self.dest.name + ".part")
+        self._stream = None
+        self.reset()
+
+    def __repr__(self) -> str:
+        """Return string representation of Gunzip class"""
+        return f"{self.__class__.__name__}({self.dest})"
+
+    def reset(self) -> None:
+        """Start a new decompressed copy"""
+        if self._stream is not None:
+            self._stream.close()
+            self._stream = None
+        self._zlib = zlib.decompressobj(wbits=47)
+
+    def update(self, chunk: bytes) -> None:
+        """Decompress the next chunk of the file"""
+        if self._stream is None:
+            self._stream = open(self._part, "wb")
+        while chunk:
+            self._stream.write(self._zlib.decompress(chunk))
+            chunk = b""
+            if self._zlib.eof:
+                chunk = self._zlib.unused_data
+                self._zlib = zlib.decompressobj(wbits=47)
+
+    def close(self) -> None:
+        """Flush the decompressed copy and move it into place"""
+        if self._stream is None:
+            self._stream = open(self._part, "wb")
+        self._stream.write(self._zlib.flush())
+        self._stream.close()
+        self._stream = None
+        os.replace(self._part, self.dest)
+
+    def satisfied(self, file: Path, meta: dict) -> bool:
+        """Reuse an existing decompressed copy of a cached file"""
+        return isnonemptyfile(self.dest) and (
+            self.dest.stat().st_mtime >= file.stat().st_mtime
+        )
+
+
 def downloadurl(
     url: str,
     file: str | Path = CONFIG.tempdir(),
     overwrite: bool = False,
     progress: bool = True,
+    ttl: float | None = None,
+    segments: int = 1,
+    transforms: list | None = None,
 ) -> Path:
     """
     Download and save file from a given URL
 
+    Interrupted downloads are kept in a `.part` file next to `file` and are
+    resumed with a Range request on the next call. The ETag, Last-Modified
+    header and fetch time of each download are stored in `<file>.meta.json`;
+    once a cached file is older than `ttl` it is revalidated with a
+    conditional request and only downloaded again if it has changed.
+
     Parameters
     ----------
     url : str
@@ -145,9 +593,19 @@ def downloadurl(
         Path to file (or directory) where downloaded file will be stored, by
         default the file will be saved to a temporary directory
     overwrite : bool, optional
-        Should existing files be overwritten, by default False
+        Should existing files be overwritten, by default False. Files with
+        stored validators are revalidated instead of downloaded again.
     progress : bool, optional
         Should a progress bar be displayed, by default True
+    ttl : float, optional
+        Seconds before a cached file is revalidated, by default `CONFIG.ttl()`
+    segments : int, optional
+        Number of connections used to fetch byte ranges of a large file in
+        parallel, by default 1. Servers that do not support ranges are read
+        with a single stream.
+    transforms : list[StreamTransform], optional
+        Transforms applied to the downloaded bytes in the same pass that
+        writes them, e.g. `Checksum` or `Gunzip`
 
     Returns
     -------
@@ -161,11 +619,16 @@ def downloadurl(
     FileExistsError
         If the file already exists and overwrite is False
     ConnectionError
-        If the URL is not valid
+        If the URL is not valid or the transfer is incomplete
+    ValueError
+        If a `Checksum` does not match the downloaded file
 
     Examples
     --------
-    >>> downloadurl("https://www.google.com/images/branding/googlelogo/2x/googlelogo_color_272x92dp.png")
+    >>> downloadurl(
+    ...     "https://www.google.com/images/branding/googlelogo/2x/"
+    ...     "googlelogo_color_272x92dp.png"
+    ... )
     PosixPath('/tmp/googlelogo_color_272x92dp.png')
     """
 
@@ -182,53 +645,770 @@ def downloadurl(
             copyfile(url, file)
             return Path(file)
 
-    # Get file name from URL
+    # Only one process downloads a given file; the others wait and reuse it
+    file = _targetfile(url, file)
+    with FileLock(file.with_name(file.name + ".lock")):
+        return _downloadlocked(
+            url, file, overwrite, progress, ttl, segments, transforms or []
+        )
+
+
+def _downloadlocked(
+    url: str,
+    file: Path,
+    overwrite: bool,
+    progress: bool,
+    ttl: float | None,
+    segments: int,
+    transforms: list,
+) -> Path:
+    """Body of `downloadurl`, run while holding the lock on `file`"""
+
+    # Return file if it exists and is fresh, otherwise revalidate it
+    validators = _validators(url, file, overwrite, ttl)
+    if validators is None:
+        return _transformcached(file, transforms)
+
+    # Interrupted transfers resume from the `.part` file on the next attempt
+    attempt = 0
+    while True:
+        try:
+            if segments > 1:
+                return _download_segmented(
+                    url, file, progress, validators, segments, transforms
+                )
+            return _download(url, file, progress, validators, transforms)
+        except (
+            requests.ConnectionError,
+            requests.exceptions.ChunkedEncodingError,
+            ConnectionError,
+            FileNotFoundError,
+        ) as E:
+            # Keep the cached copy if it cannot be revalidated
+            if validators and not overwrite:
+                print(f"[bold yellow]Warning[/bold yellow]: Using cached {file}")
+                return _transformcached(file, transforms)
+            # Error statuses were already retried by the transport
+            if isinstance(E, (ConnectionError, FileNotFoundError)):
+                raise
+            if attempt >= TRANSPORT.retries:
+                raise
+            TRANSPORT.wait(attempt)
+            attempt += 1
+
+
+async def downloadurl_async(
+    url: str,
+    file: str | Path = CONFIG.tempdir(),
+    overwrite: bool = False,
+    progress: bool = True,
+    ttl: float | None = None,
+    session=None,
+    transforms: list | None = None,
+) -> Path:
+    """
+    Download and save file from a given URL without blocking the event loop
+
+    This is the asyncio counterpart of `downloadurl`: files are named, cached,
+    revalidated and resumed in the same way. Requires `aiohttp`, which is
+    installed with the `async` extra (`pip install infoml[async]`).
+
+    Parameters
+    ----------
+    url : str
+        The URL to download the file from
+    file : str, optional
+        Path to file (or directory) where downloaded file will be stored, by
+        default the file will be saved to a temporary directory
+    overwrite : bool, optional
+        Should existing files be overwritten, by default False
+    progress : bool, optional
+        Should a progress bar be displayed, by default True
+    ttl : float, optional
+        Seconds before a cached file is revalidated, by default `CONFIG.ttl()`
+    session : aiohttp.ClientSession, optional
+        Session used for the request, by default a new session is opened
+    transforms : list[StreamTransform], optional
+        Transforms applied to the downloaded bytes, as in `downloadurl`
+
+    Returns
+    -------
+    Path
+        Path to downloaded file
+
+    Raises
+    ------
+    FileNotFoundError
+        If the file does not exist
+    ConnectionError
+        If the URL is not valid or the transfer is incomplete
+
+    Examples
+    --------
+    >>> await downloadurl_async(
+    ...     "https://sbcb.inf.ufrgs.br/data/cumida/Genes/Breast/GSE70947/"
+    ...     "Breast_GSE70947.csv"
+    ... )
+    PosixPath('/tmp/infoml/breast_gse70947.csv')
+    """
+
+    aiohttp = _aiohttp()
+
+    # Local files are copied synchronously
+    if not re.search(r"(http[s]?|ftp):\/\/", url):
+        return downloadurl(url, file, overwrite, progress, ttl, transforms=transforms)
+
+    file = _targetfile(url, Path(file))
+    transforms = transforms or []
+    if session is None:
+        async with aiohttp.ClientSession() as session:
+            return await downloadurl_async(
+                url, file, overwrite, progress, ttl, session, transforms
+            )
+
+    # Only one process downloads a given file; the others wait and reuse it
+    lock = FileLock(file.with_name(file.name + ".lock"))
+    await lock.acquire_async()
+    try:
+        return await _downloadlocked_async(
+            session, url, file, overwrite, progress, ttl, transforms
+        )
+    finally:
+        lock.release()
+
+
+async def _downloadlocked_async(
+    session,
+    url: str,
+    file: Path,
+    overwrite: bool,
+    progress: bool,
+    ttl: float | None,
+    transforms: list,
+) -> Path:
+    """Body of `downloadurl_async`, run while holding the lock on `file`"""
+
+    aiohttp = _aiohttp()
+
+    # Return file if it exists and is fresh, otherwise revalidate it
+    validators = _validators(url, file, overwrite, ttl)
+    if validators is None:
+        return _transformcached(file, transforms)
+
+    # Interrupted transfers resume from the `.part` file on the next attempt
+    attempt = 0
+    while True:
+        try:
+            return await _download_async(
+                session, url, file, progress, validators, transforms
+            )
+        except (aiohttp.ClientError, asyncio.TimeoutError) as E:
+            if validators and not overwrite:
+                print(f"[bold yellow]Warning[/bold yellow]: Using cached {file}")
+                return _transformcached(file, transforms)
+            if attempt >= TRANSPORT.retries:
+                if isinstance(E, aiohttp.ClientResponseError):
+                    raise ConnectionError(
+                        f"{E.status}: Could not download file {url}"
+                    ) from E
+                raise
+            await asyncio.sleep(TRANSPORT.backoff * 2**attempt)
+            attempt += 1
+
+
+async def downloadurls_async(
+    urls: list[str],
+    files: str | Path | list = CONFIG.tempdir(),
+    overwrite: bool = False,
+    progress: bool = True,
+    ttl: float | None = None,
+    max_per_host: int = 4,
+    return_exceptions: bool = False,
+) -> list:
+    """
+    Download several URLs concurrently
+
+    Works like `asyncio.gather` over `downloadurl_async`, using one session
+    whose connector allows at most `max_per_host` connections to each host.
+
+    Parameters
+    ----------
+    urls : list[str]
+        The URLs to download
+    files : str | Path | list, optional
+        A directory for all downloads, or one path per URL, by default the
+        files will be saved to a temporary directory
+    overwrite : bool, optional
+        Should existing files be overwritten, by default False
+    progress : bool, optional
+        Should progress bars be displayed, by default True
+    ttl : float, optional
+        Seconds before a cached file is revalidated, by default `CONFIG.ttl()`
+    max_per_host : int, optional
+        Maximum number of simultaneous connections to one host, by default 4
+    return_exceptions : bool, optional
+        Return exceptions in place of paths instead of raising the first one,
+        by default False
+
+    Returns
+    -------
+    list
+        Paths to the downloaded files (or exceptions), in the order of `urls`
+
+    Examples
+    --------
+    >>> asyncio.run(downloadurls_async([url1, url2], "./data", max_per_host=2))
+    [PosixPath('data/file1.csv'), PosixPath('data/file2.csv')]
+    """
+
+    aiohttp = _aiohttp()
+
+    if not isinstance(files, list):
+        files = [files] * len(urls)
+    assert len(files) == len(urls), "files must have one path per URL"
+
+    connector = aiohttp.TCPConnector(limit=0, limit_per_host=max_per_host)
+    async with aiohttp.ClientSession(connector=connector) as session:
+        return await asyncio.gather(
+            *[
+                downloadurl_async(url, file, overwrite, progress, ttl, session)
+                for url, file in zip(urls, files)
+            ],
+            return_exceptions=return_exceptions,
+        )
+
+
+def _aiohttp():
+    """Import aiohttp, which is only needed for asynchronous downloads"""
+    try:
+        import aiohttp
+    except ImportError:
+        raise ImportError(
+            "Asynchronous downloads require aiohttp: pip install infoml[async]"
+        )
+    return aiohttp
+
+
+def _targetfile(url: str, file: Path) -> Path:
+    """Get the path a URL is downloaded to"""
     if file.is_dir():
         fname = slugify(url.split("?")[0].split("/")[-1])
-        file = (file / fname).resolve()
+        return (file / fname).resolve()
+    return file.resolve()
+
+
+def _validators(
+    url: str, file: Path, overwrite: bool, ttl: float | None
+) -> dict | None:
+    """
+    Decide whether a cached download must be fetched again
+
+    Returns None if `file` can be used as is, otherwise the stored metadata to
+    revalidate it with (empty if it must be downloaded from scratch).
+    """
+
+    if not isnonemptyfile(file):
+        return dict()
+
+    meta = _readjson(file.with_name(file.name + ".meta.json"))
+    ttl = CONFIG.ttl() if ttl is None else ttl
+    if meta.get("url") != url or meta.get("size") != file.stat().st_size:
+        return dict() if overwrite else None
+    if not overwrite and time.time() - meta.get("fetched", 0) < ttl:
+        return None
+    return meta
+
+
+def _readjson(file: Path) -> dict:
+    """Read a JSON sidecar file, returning an empty dict if it is unusable"""
+    try:
+        with open(file, "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _writejson(file: Path, data: dict) -> None:
+    """Atomically write a JSON sidecar file"""
+    temp = file.with_name(f"{file.name}.{os.getpid()}.tmp")
+    with open(temp, "w") as f:
+        json.dump(data, f)
+    os.replace(temp, file)
+
+
+def _contentrange(header: str) -> tuple[int, int]:
+    """Parse the start and total size from a Content-Range header"""
+    match = re.match(r"bytes (?:(\d+)-\d+|\*)/(\d+|\*)", header)
+    if not match:
+        return 0, 0
+    start, total = match.groups()
+    return int(start or 0), int(total) if total != "*" else 0
+
+
+def _request(url: str, file: Path, validators: dict | None) -> tuple[dict, int]:
+    """
+    Build the headers for downloading `file`
+
+    The request is conditional if `validators` are given, and resumes from the
+    end of `<file>.part` if the server's validators for it are known.
+
+    Returns
+    -------
+    tuple[dict, int]
+        Request headers and the offset the transfer starts at
+    """
+
+    part = file.with_name(file.name + ".part")
+    partmeta = file.with_name(file.name + ".part.json")
+
+    # Revalidate the cached copy
+    headers = {"Accept-Encoding": "identity"}
+    if validators:
+        if validators.get("etag"):
+            headers["If-None-Match"] = validators["etag"]
+        if validators.get("last_modified"):
+            headers["If-Modified-Since"] = validators["last_modified"]
+
+    # Resume a previous transfer if it can be validated
+    state = _readjson(partmeta)
+    offset = part.stat().st_size if part.is_file() else 0
+    validator = state.get("etag", "")
+    if validator.startswith("W/"):
+        validator = ""
+    validator = validator or state.get("last_modified")
+    if offset and validator and state.get("url") == url and "segments" not in state:
+        headers["Range"] = f"bytes={offset}-"
+        headers["If-Range"] = validator
     else:
-        file = file.resolve()
-
-    # Return file if it exists and overwrite is False
-    if isnonemptyfile(file) and not overwrite:
-        return file
-
-    # Download the file
-    # TODO: See if urllib.request.urlretrieve can be used instead
-    r = requests.get(url, stream=True, allow_redirects=True, timeout=(3, 30))
-    if r.status_code == 200:
-        size = int(r.headers.get("content-length", 0))
-
-        if progress:
-            with open(file, "wb") as stream:
-                with tqdm(
-                    total=size,
-                    unit="B",
-                    unit_scale=True,
-                    desc=file.name,
-                    leave=False,
-                    dynamic_ncols=True,
-                    initial=0,
-                ) as pbar:
-                    for chunk in r.iter_content(chunk_size=1024):
-                        if chunk:
-                            stream.write(chunk)
-                            pbar.update(len(chunk))
+        offset = 0
 
-        else:
-            with open(file, "wb") as stream:
-                for chunk in r.iter_content(chunk_size=1024):
-                    if chunk:
-                        stream.write(chunk)
+    return headers, offset
+
+
+def _response(
+    url: str,
+    file: Path,
+    status: int,
+    headers,
+    offset: int,
+    validators: dict | None,
+) -> tuple[str, int, int]:
+    """
+    Decide what to do with the response to a request built by `_request`
+
+    Returns
+    -------
+    tuple[str, int, int]
+        The action, the offset to write the body at and the full file size.
+        The action is "write" to stream the body into `<file>.part`, "done"
+        if `<file>.part` is already complete, "current" if the cached file is
+        still valid, or "restart" if the transfer must start over.
 
-    elif r.status_code == 404:
+    Raises
+    ------
+    FileNotFoundError
+        If the server answered 404
+    ConnectionError
+        If the server answered with any other error
+    """
+
+    part = file.with_name(file.name + ".part")
+    partmeta = file.with_name(file.name + ".part.json")
+    action, size = "write", int(headers.get("content-length", 0))
+
+    if status in (206, 416):
+        start, size = _contentrange(headers.get("content-range", ""))
+        if status == 416 and size == offset:
+            # The previous transfer had already received every byte
+            action = "done"
+        elif status == 416 or start != offset:
+            part.unlink(missing_ok=True)
+            partmeta.unlink(missing_ok=True)
+            return "restart", 0, 0
+    elif status == 304 and validators:
+        part.unlink(missing_ok=True)
+        partmeta.unlink(missing_ok=True)
+        _writejson(
+            file.with_name(file.name + ".meta.json"),
+            {**validators, "fetched": time.time()},
+        )
+        return "current", 0, 0
+    elif status == 200:
+        offset = 0
+    elif status == 404:
         raise FileNotFoundError(f"File {url} does not exist")
     else:
-        raise ConnectionError(f"{r.status_code}: Could not download file {url}")
+        raise ConnectionError(f"{status}: Could not download file {url}")
+
+    # Record validators so that an interrupted transfer can be resumed
+    _writejson(
+        partmeta,
+        {
+            "url": url,
+            "etag": headers.get("etag", ""),
+            "last_modified": headers.get("last-modified", ""),
+            "size": size,
+        },
+    )
+
+    return action, offset, size
+
+
+def _feed(transforms: list, file: Path) -> None:
+    """Pass the bytes of a file on disk to stream transforms"""
+    if transforms:
+        with open(file, "rb") as f:
+            for chunk in iter(lambda: f.read(TRANSPORT.chunksize()), b""):
+                for transform in transforms:
+                    transform.update(chunk)
+
+
+def _reset(transforms: list) -> None:
+    """Discard the bytes seen by stream transforms in a failed attempt"""
+    for transform in transforms:
+        transform.reset()
+
+
+def _transformcached(file: Path, transforms: list) -> Path:
+    """Apply stream transforms to a cached file that was not downloaded"""
+
+    meta = file.with_name(file.name + ".meta.json")
+    state = _readjson(meta)
+    pending = [t for t in transforms if not t.satisfied(file, state)]
+    if pending:
+        _reset(pending)
+        _feed(pending, file)
+        for transform in pending:
+            transform.close()
+            transform.record(state)
+        if meta.is_file():
+            _writejson(meta, state)
+
+    return file
+
+
+def _finalize(url: str, file: Path, size: int, transforms: list | None = None) -> Path:
+    """Rename a complete `.part` file to `file` and store its validators"""
+
+    part = file.with_name(file.name + ".part")
+    partmeta = file.with_name(file.name + ".part.json")
+
+    # Only expose the file once it is complete
+    received = part.stat().st_size
+    if size and received != size:
+        raise ConnectionError(
+            f"Download of {url} stopped after {received} of {size} bytes"
+        )
+    state = {k: v for k, v in _readjson(partmeta).items() if k != "segments"}
+    state.update(size=received, fetched=time.time())
+
+    # Rejected downloads are discarded
+    try:
+        for transform in transforms or []:
+            transform.close()
+            transform.record(state)
+    except Exception:
+        part.unlink(missing_ok=True)
+        partmeta.unlink(missing_ok=True)
+        raise
+
+    os.replace(part, file)
+    _writejson(file.with_name(file.name + ".meta.json"), state)
+    partmeta.unlink(missing_ok=True)
 
     return file
 
 
+class _Progress:
+    """Progress bar for a download, updated at most once per interval"""
+
+    def __init__(self, file: Path, size: int, offset: int, progress: bool):
+        """Initialize the progress bar"""
+        self.pbar = tqdm(
+            total=size,
+            unit="B",
+            unit_scale=True,
+            desc=file.name,
+            leave=False,
+            dynamic_ncols=True,
+            initial=offset,
+            disable=not progress,
+        )
+        self.pending, self.last = 0, time.monotonic()
+        self.lock = threading.Lock()
+
+    def __enter__(self):
+        """Enter context manager"""
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        """Flush pending updates and close the progress bar"""
+        self.pbar.update(self.pending)
+        self.pbar.close()
+
+    def update(self, n: int) -> None:
+        """Record `n` more bytes"""
+        with self.lock:
+            self.pending += n
+            if time.monotonic() - self.last > TRANSPORT.interval:
+                self.pbar.update(self.pending)
+                self.pending, self.last = 0, time.monotonic()
+
+
+def _download(
+    url: str,
+    file: Path,
+    progress: bool = True,
+    validators: dict | None = None,
+    transforms: list | None = None,
+) -> Path:
+    """
+    Stream a URL to `file` through a resumable `.part` file
+
+    The response is written to `<file>.part` and the validators sent by the
+    server (ETag or Last-Modified) are stored in `<file>.part.json`. If a
+    previous transfer was interrupted, the download resumes with a Range
+    request; the server answers with the whole file instead if it has
+    changed. `file` only appears, through an atomic rename, once the number
+    of bytes received matches the size reported by the server, and the
+    validators are then kept in `<file>.meta.json`.
+
+    Parameters
+    ----------
+    url : str
+        The URL to download the file from
+    file : Path
+        Path to the final file
+    progress : bool, optional
+        Should a progress bar be displayed, by default True
+    validators : dict, optional
+        Stored metadata of the cached copy of `file`. If given, the request is
+        conditional and a 304 response leaves `file` untouched.
+    transforms : list[StreamTransform], optional
+        Transforms applied to the bytes as they are written
+
+    Returns
+    -------
+    Path
+        Path to downloaded file
+    """
+
+    transforms = transforms or []
+    headers, offset = _request(url, file, validators)
+    with TRANSPORT.get(url, headers=headers, stream=True) as r:
+        action, offset, size = _response(
+            url, file, r.status_code, r.headers, offset, validators
+        )
+        if action == "restart":
+            return _download(url, file, progress, validators, transforms)
+        if action == "current":
+            return _transformcached(file, transforms)
+
+        part = file.with_name(file.name + ".part")
+        _reset(transforms)
+        if offset:
+            _feed(transforms, part)
+        with open(part, "ab" if offset else "wb") as stream:
+            with _Progress(file, size, offset, progress) as pbar:
+                if action == "write":
+                    for chunk in r.iter_content(TRANSPORT.chunksize(size - offset)):
+                        stream.write(chunk)
+                        for transform in transforms:
+                            transform.update(chunk)
+                        pbar.update(len(chunk))
+
+    return _finalize(url, file, size, transforms)
+
+
+def _pwrite(fd: int, data: bytes, position: int) -> None:
+    """Write `data` to a file descriptor at `position`"""
+    view = memoryview(data)
+    while view:
+        if hasattr(os, "pwrite"):
+            n = os.pwrite(fd, view, position)
+        else:
+            os.lseek(fd, position, os.SEEK_SET)
+            n = os.write(fd, view)
+        view, position = view[n:], position + n
+
+
+def _download_segmented(
+    url: str,
+    file: Path,
+    progress: bool = True,
+    validators: dict | None = None,
+    segments: int = 4,
+    transforms: list | None = None,
+) -> Path:
+    """
+    Download a file as byte ranges fetched over several connections
+
+    A one-byte range request learns the size and validators of the file. The
+    `.part` file is then preallocated and each segment is written in place
+    by its own thread. Progress of every segment is kept in `<file>.part.json`
+    so that a failed transfer only fetches the missing bytes again. Falls
+    back to `_download` if the server does not honour range requests, sends
+    no validator, or the file is too small to split.
+
+    Parameters
+    ----------
+    url : str
+        The URL to download the file from
+    file : Path
+        Path to the final file
+    progress : bool, optional
+        Should a progress bar be displayed, by default True
+    validators : dict, optional
+        Stored metadata of the cached copy of `file`
+    segments : int, optional
+        Maximum number of simultaneous connections, by default 4
+    transforms : list[StreamTransform], optional
+        Transforms applied to the file once all segments have arrived
+
+    Returns
+    -------
+    Path
+        Path to downloaded file
+    """
+
+    part = file.with_name(file.name + ".part")
+    partmeta = file.with_name(file.name + ".part.json")
+
+    # Probe the size of the file and its support for ranges
+    headers, _ = _request(url, file, validators)
+    headers.pop("If-Range", None)
+    headers["Range"] = "bytes=0-0"
+    with TRANSPORT.get(url, headers=headers, stream=True) as r:
+        if r.status_code == 304 and validators:
+            _response(url, file, r.status_code, r.headers, 0, validators)
+            return _transformcached(file, transforms or [])
+        if r.status_code == 404:
+            raise FileNotFoundError(f"File {url} does not exist")
+        _, size = _contentrange(r.headers.get("content-range", ""))
+        etag = r.headers.get("etag", "")
+        modified = r.headers.get("last-modified", "")
+
+    validator = modified if etag.startswith("W/") else etag or modified
+    count = min(segments, -(-size // TRANSPORT.min_segment))
+    if r.status_code != 206 or not validator or count < 2:
+        return _download(url, file, progress, validators, transforms)
+
+    # Continue a previous segmented transfer or preallocate a new one
+    state = _readjson(partmeta)
+    if not (
+        part.is_file()
+        and state.get("url") == url
+        and state.get("size") == size
+        and validator in (state.get("etag"), state.get("last_modified"))
+        and "segments" in state
+    ):
+        bounds = [size * i // count for i in range(count + 1)]
+        state = {
+            "url": url,
+            "etag": etag,
+            "last_modified": modified,
+            "size": size,
+            "segments": [[bounds[i], bounds[i + 1] - 1] for i in range(count)],
+        }
+        with open(part, "wb") as f:
+            if hasattr(os, "posix_fallocate"):
+                os.posix_fallocate(f.fileno(), 0, size)
+            else:
+                f.truncate(size)
+        _writejson(partmeta, state)
+    remaining = sum(end - start + 1 for start, end in state["segments"])
+
+    def fetch(segment: list) -> bool:
+        """Fetch one byte range, advancing `segment[0]` as bytes are written"""
+        if segment[0] > segment[1]:
+            return True
+        headers = {
+            "Accept-Encoding": "identity",
+            "Range": f"bytes={segment[0]}-{segment[1]}",
+            "If-Range": validator,
+        }
+        with TRANSPORT.get(url, headers=headers, stream=True) as r:
+            start, _ = _contentrange(r.headers.get("content-range", ""))
+            if r.status_code != 206 or start != segment[0]:
+                return False
+            fd = os.open(part, os.O_WRONLY | getattr(os, "O_BINARY", 0))
+            try:
+                chunksize = TRANSPORT.chunksize(segment[1] - segment[0] + 1)
+                for chunk in r.iter_content(chunksize):
+                    _pwrite(fd, chunk, segment[0])
+                    segment[0] += len(chunk)
+                    pbar.update(len(chunk))
+            finally:
+                os.close(fd)
+        return segment[0] > segment[1]
+
+    with _Progress(file, size, size - remaining, progress) as pbar:
+        with ThreadPoolExecutor(max_workers=count) as pool:
+            jobs = [pool.submit(fetch, segment) for segment in state["segments"]]
+        _writejson(partmeta, state)
+
+    # A range was refused, most likely because the file changed
+    errors = [job.exception() for job in jobs if job.exception()]
+    if not errors and not all(job.result() for job in jobs):
+        part.unlink(missing_ok=True)
+        partmeta.unlink(missing_ok=True)
+        return _download(url, file, progress, validators, transforms)
+    if errors:
+        raise errors[0]
+
+    # Segments arrive out of order, so transforms read the finished file
+    _reset(transforms or [])
+    _feed(transforms or [], part)
+    return _finalize(url, file, size, transforms)
+
+
+async def _download_async(
+    session,
+    url: str,
+    file: Path,
+    progress: bool = True,
+    validators: dict | None = None,
+    transforms: list | None = None,
+) -> Path:
+    """Asynchronous version of `_download` using an aiohttp session"""
+
+    aiohttp = _aiohttp()
+    transforms = transforms or []
+
+    headers, offset = _request(url, file, validators)
+    timeout = aiohttp.ClientTimeout(
+        sock_connect=TRANSPORT.timeout[0], sock_read=TRANSPORT.timeout[1]
+    )
+    async with session.get(url, headers=headers, timeout=timeout) as r:
+        if r.status in TRANSPORT.STATUS_FORCELIST:
+            r.raise_for_status()
+        action, offset, size = _response(
+            url, file, r.status, r.headers, offset, validators
+        )
+        if action == "restart":
+            return await _download_async(
+                session, url, file, progress, validators, transforms
+            )
+        if action == "current":
+            return _transformcached(file, transforms)
+
+        part = file.with_name(file.name + ".part")
+        _reset(transforms)
+        if offset:
+            _feed(transforms, part)
+        with open(part, "ab" if offset else "wb") as stream:
+            with _Progress(file, size, offset, progress) as pbar:
+                if action == "write":
+                    chunksize = TRANSPORT.chunksize(size - offset)
+                    async for chunk in r.content.iter_chunked(chunksize):
+                        stream.write(chunk)
+                        for transform in transforms:
+                            transform.update(chunk)
+                        pbar.update(len(chunk))
+
+    return _finalize(url, file, size, transforms)
+
+
 class SQLite:
     """
     Wrapper for connecting to and querying SQLite databases
@@ -309,7 +1489,9 @@ class SQLite:
         Examples
         --------
         >>> db = SQLite("test.db")
-        >>> db.execute("CREATE TABLE IF NOT EXISTS test (id INTEGER PRIMARY KEY, name TEXT)")
+        >>> db.execute(
+        ...     "CREATE TABLE IF NOT EXISTS test (id INTEGER PRIMARY KEY, name TEXT)"
+        ... )
         <sqlite3.Cursor object at 0x7f8b8c0b0e00>
         >>> db.execute("INSERT INTO test (name) VALUES ('John')")
         <sqlite3.Cursor object at 0x7f8b8c0b0e00>
@@ -680,7 +1862,15 @@ else:
         "tempfile",  # --
         "unzip",  # --
         "slugify",
+        "Transport",
+        "TRANSPORT",
+        "StreamTransform",
+        "Checksum",
+        "Gunzip",
+        "FileLock",
         "downloadurl",  # --
+        "downloadurl_async",
+        "downloadurls_async",
         "SQLite",  # --
         "iohead",  # --
         "system",  # --
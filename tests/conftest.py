@@ -0,0 +1,160 @@
+"""
+Shared fixtures for the `infoml` tests.
+"""
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from hashlib import md5
+import threading
+import pytest
+import gzip
+import re
+
+
+class _Handler(BaseHTTPRequestHandler):
+    """Serve in-memory files with support for byte ranges"""
+
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        """Handle GET requests"""
+        server = self.server
+        server.requests.append((self.path, dict(self.headers)))  # type: ignore
+
+        body = server.files.get(self.path)  # type: ignore
+        status = server.status.get(self.path, [])  # type: ignore
+        if body is None or status:
+            self.send_response(status.pop(0) if status else 404)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+
+        etag = f'"{md5(body).hexdigest()}"'
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.end_headers()
+            return
+
+        start, end, status = 0, len(body) - 1, 200
+        match = re.match(r"bytes=(\d+)-(\d*)", self.headers.get("Range", ""))
+        ranges = server.ranges and self.headers.get("If-Range", etag) == etag  # type: ignore
+        if match and ranges:
+            start = int(match[1])
+            end = min(int(match[2] or end), end)
+            status = 206
+            if start >= len(body):
+                self.send_response(416)
+                self.send_header("Content-Range", f"bytes */{len(body)}")
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+
+        payload = body[start : end + 1]
+        self.send_response(status)
+        self.send_header("Content-Length", str(len(payload)))
+        self.send_header("Accept-Ranges", "bytes")
+        self.send_header("ETag", etag)
+        if status == 206:
+            self.send_header("Content-Range", f"bytes {start}-{end}/{len(body)}")
+        self.end_headers()
+
+        # Simulate a dropped connection after `cut` bytes
+        cut = server.cut.pop(self.path, None)  # type: ignore
+        if cut is not None:
+            self.wfile.write(payload[:cut])
+            self.close_connection = True
+        else:
+            self.wfile.write(payload)
+
+    def log_message(self, *args):
+        """Silence request logging"""
+        pass
+
+
+@pytest.fixture
+def httpserver():
+    """
+    A local HTTP server serving the bytes stored in `server.files`.
+
+    `server.cut[path]` drops the connection after that many bytes and
+    `server.status[path]` is a list of error statuses to answer with first.
+    Range requests are ignored if `server.ranges` is False.
+    """
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    server.files = dict()  # type: ignore
+    server.requests = list()  # type: ignore
+    server.cut = dict()  # type: ignore
+    server.status = dict()  # type: ignore
+    server.ranges = True  # type: ignore
+    server.url = lambda path: f"http://127.0.0.1:{server.server_port}{path}"  # type: ignore
+
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def make_soft(nsamples: int = 3, nprobes: int = 5) -> str:
+    """Build the text of a small GSE family SOFT file."""
+    lines = [
+        "^DATABASE = GeoMiame",
+        "!Database_name = Gene Expression Omnibus (GEO)",
+        "^SERIES = GSE1",
+        "!Series_title = Test series",
+        "!Series_geo_accession = GSE1",
+        "^PLATFORM = GPL1",
+        "!Platform_title = Test platform",
+        "!Platform_geo_accession = GPL1",
+        "#ID = Probe ID",
+        "#GB_ACC = GenBank accession",
+        "#Gene Symbol = Gene symbol",
+        "#ENTREZ_GENE_ID = Entrez Gene ID",
+        "#SEQUENCE = Probe sequence",
+        "!platform_table_begin",
+        "ID\tGB_ACC\tGene Symbol\tENTREZ_GENE_ID\tSEQUENCE",
+    ]
+    for j in range(nprobes):
+        gb = f"NM_{j // 2}" if j % 3 else ""
+        lines.append(f"p{j}\t{gb}\tG{j // 2}\t{100 + j // 2}\t{'ACGT' * (j + 1)}")
+    lines.append("!platform_table_end")
+    for i in range(nsamples):
+        lines += [
+            f"^SAMPLE = GSM{i}",
+            f"!Sample_title = sample {i}",
+            f"!Sample_geo_accession = GSM{i}",
+            "!Sample_platform_id = GPL1",
+            f"!Sample_characteristics_ch1 = class: {'tumor' if i % 2 else 'normal'}",
+            "#ID_REF = Probe ID",
+            "#VALUE = Normalized signal",
+            "#DETECTION = Detection call",
+            "!sample_table_begin",
+            "ID_REF\tVALUE\tDETECTION",
+        ]
+        # Samples list their probes in different orders
+        for j in reversed(range(nprobes)) if i % 2 else range(nprobes):
+            lines.append(f"p{j}\t{i * 10 + j + 0.5}\t{'P' if j % 2 else 'A'}")
+        lines.append("!sample_table_end")
+    return "\n".join(lines) + "\n"
+
+
+@pytest.fixture
+def soft_file(tmp_path):
+    """A gzipped family SOFT file for GSE1 with one platform and 3 samples."""
+    path = tmp_path / "GSE1_family.soft.gz"
+    with gzip.open(path, "wt") as f:
+        f.write(make_soft())
+    return path
+
+
+@pytest.fixture
+def cachedir(tmp_path):
+    """Point `CONFIG.cache()` at a temporary directory and clear `MEMO`."""
+    from infoml.binf.cache import MEMO
+    from infoml import CONFIG
+
+    old = CONFIG.cache()
+    MEMO.clear()
+    yield CONFIG.cache(tmp_path / "cache")
+    CONFIG.cache(old)
+    MEMO.clear()
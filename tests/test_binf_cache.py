@@ -0,0 +1,95 @@
+"""
+Tests for the `infoml.binf.cache` module.
+"""
+
+import pytest
+
+
+@pytest.fixture
+def manager(tmp_path):
+    """A cache manager with a 250 byte budget."""
+    from infoml.binf.cache import CacheManager
+
+    return CacheManager(tmp_path / "cache", maxsize=250)
+
+
+def _store(manager, name, source=None, size=100):
+    """Write and register an entry of `size` bytes"""
+    path = manager.path(name, source, ".bin")
+    path.parent.mkdir(exist_ok=True)
+    path.write_bytes(b"x" * size)
+    return manager.add(name, path, source)
+
+
+def test_cache_manager_fingerprint(manager, tmp_path):
+    """Test that entries are keyed by the contents of their source."""
+    source = tmp_path / "source.txt"
+    source.write_text("version 1")
+
+    assert manager.get("A", source, ".bin") is None
+    path = _store(manager, "A", source)
+    assert manager.get("A", source, ".bin") == path
+    assert manager.get("A", suffix=".bin") == path
+    assert manager.stats == {"hits": 2, "misses": 1, "evictions": 0}
+
+    # A new version of the source misses and replaces the old entry
+    source.write_text("version 2")
+    assert manager.get("A", source, ".bin") is None
+    new = _store(manager, "A", source)
+    assert new != path and not path.exists()
+    assert manager.info()["entries"] == 1
+
+
+def test_cache_manager_lru(manager):
+    """Test that the least recently used entries are evicted first."""
+    a = _store(manager, "A")
+    b = _store(manager, "B")
+    assert manager.get("A", suffix=".bin") == a
+    c = _store(manager, "C")
+
+    assert not b.exists() and a.exists() and c.exists()
+    assert manager.get("B", suffix=".bin") is None
+    assert manager.info()["size"] == 200
+    assert manager.stats["evictions"] == 1
+
+
+def test_cache_manager_prune(manager):
+    """Test removing entries by name, age and size."""
+    a = _store(manager, "A")
+    _store(manager, "B")
+
+    assert manager.prune(name="A") == [a.name]
+    assert not a.exists()
+    assert manager.prune(maxsize=50) == ["B.bin"]
+    assert manager.prune(older_than=0) == []
+    assert manager.info()["entries"] == 0
+
+
+def test_memory_cache():
+    """Test that values are evicted by their footprint."""
+    from infoml.binf.cache import MemoryCache, footprint
+    import pandas as pd
+    import numpy as np
+
+    memo = MemoryCache(maxsize=2500)
+    tables = {k: pd.DataFrame({"x": np.zeros(100)}) for k in "abc"}
+    assert 800 <= footprint(tables["a"]) < 1000
+
+    memo.put("a", tables["a"])
+    memo.put("b", tables["b"])
+    assert memo.get("a") is tables["a"]
+    memo.put("c", tables["c"])
+    assert "b" not in memo and "a" in memo and "c" in memo
+    assert memo.get("b") is None
+
+    # Values larger than the budget are not cached
+    memo.put("big", pd.DataFrame({"x": np.zeros(1000)}))
+    assert "big" not in memo
+    assert memo.info() == {
+        "entries": 2,
+        "size": memo.size,
+        "maxsize": 2500,
+        "hits": 1,
+        "misses": 1,
+        "evictions": 1,
+    }
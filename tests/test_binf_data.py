@@ -0,0 +1,745 @@
+"""
+Tests for the `infoml.binf.data` module.
+"""
+
+import pytest
+import json
+
+
+@pytest.fixture
+def cumida(tmp_path):
+    """A CuMiDa instance built from a local two-dataset index."""
+    from infoml.binf.data import CuMiDa
+
+    index = [
+        {
+            "gse": gse,
+            "platform": 570,
+            "type": "Breast",
+            "classes": 2,
+            "samples": 10,
+            "genes": 3,
+            "manufacturer": "Affymetrix",
+            "downloads": {"csv": f"/cumida/Breast_GSE{gse}.csv"},
+        }
+        for gse in (100, 200)
+    ]
+    with open(tmp_path / "datasets.json", "w") as f:
+        json.dump(index, f)
+
+    return CuMiDa(tmp_path)
+
+
+def test_cumida_download_concurrent(cumida, monkeypatch):
+    """Test that `CuMiDa.download` reports per-item errors."""
+    import infoml.binf.data as data
+
+    def fake_downloadurl(url, file, progress=True):
+        if "GSE100" in url:
+            raise ConnectionError("connection reset")
+        return file
+
+    monkeypatch.setattr(data, "downloadurl", fake_downloadurl)
+    monkeypatch.setattr(data, "probeindex", lambda acc, *a, **k: f"index {acc}")
+
+    cumida.download(cumida.index, max_connections=3)
+
+    assert [p.name for p in cumida.file_paths] == [
+        "Breast_GSE100.csv",
+        "Breast_GSE200.csv",
+    ]
+    assert cumida._probes == {"GPL570": "index GPL570"}
+    assert list(cumida.errors) == ["Breast_GSE100.csv"]
+    assert isinstance(cumida.errors["Breast_GSE100.csv"], ConnectionError)
+
+
+def test_cumida_catalog(tmp_path, monkeypatch):
+    """Test that the CuMiDa catalog is built lazily and filtered in SQLite."""
+    import infoml.binf.data as data
+    import os
+
+    index = [
+        {
+            "gse": gse,
+            "platform": platform,
+            "type": kind,
+            "classes": 2,
+            "samples": samples,
+            "genes": 100,
+            "manufacturer": "Affymetrix",
+            "downloads": {"csv": f"/cumida/{kind}_GSE{gse}.csv"},
+        }
+        for gse, platform, kind, samples in [
+            (1, 570, "Breast", 150),
+            (2, 96, "Breast", 150),
+            (3, 570, "Breast", 50),
+            (4, 570, "Liver", 200),
+        ]
+    ]
+    with open(tmp_path / "datasets.json", "w") as f:
+        json.dump(index, f)
+
+    # Construction does not touch the index
+    calls = []
+    monkeypatch.setattr(data, "downloadurl", lambda *a, **k: calls.append(a))
+    cumida = data.CuMiDa(tmp_path)
+    assert calls == [] and not (tmp_path / "datasets.db").exists()
+
+    breast = cumida.query(type="Breast", platform="GPL570", min_samples=100)
+    assert breast.index.to_list() == [("GSE1", "Breast")]
+    assert breast.loc[("GSE1", "Breast"), "URL"].endswith("/cumida/Breast_GSE1.csv")
+    small = cumida.query(platform=["GPL96", "GPL570"], max_samples=100)
+    assert small.index.to_list() == [("GSE3", "Breast")]
+    assert cumida.query(type="Lung").empty
+    assert (tmp_path / "datasets.db").is_file() and len(calls) == 1
+
+    # The full index keeps its layout
+    assert cumida.index.index.names == ["ID", "Type"]
+    assert list(cumida.index.columns) == [
+        "Platform",
+        "Manufacturer",
+        "Classes",
+        "Samples",
+        "Genes",
+        "URL",
+    ]
+    assert cumida.index["Platform"].is_monotonic_increasing
+    assert len(cumida.index) == 4 and len(calls) == 1
+
+    # The catalog is rebuilt when the JSON index changes
+    with open(tmp_path / "datasets.json", "w") as f:
+        json.dump(index[:1], f)
+    os.utime(tmp_path / "datasets.json", ns=(0, 0))
+    assert len(data.CuMiDa(tmp_path).index) == 1
+
+
+def test_geourl():
+    """Test the function `geourl`."""
+    from infoml.binf.data import geourl
+
+    assert geourl("gse50499").endswith(
+        "/series/GSE50nnn/GSE50499/soft/GSE50499_family.soft.gz"
+    )
+    assert geourl("GPL570").endswith("acc=GPL570&form=text&view=full")
+    with pytest.raises(ValueError):
+        geourl("GSM1")
+
+
+def test_geodlparse_columnar_cache(soft_file, cachedir):
+    """Test that cached GEO data round-trips and can be partially loaded."""
+    from infoml.binf.data import geodlparse
+    import pandas as pd
+    import numpy as np
+
+    gse = geodlparse("GSE1", soft_file.parent, cache=True)
+    assert len(list(cachedir.glob("GSE1-*.geocache/meta.json"))) == 1
+
+    cached = geodlparse("GSE1", soft_file.parent, cache=True)
+    assert cached.metadata == gse.metadata
+    assert list(cached.gsms) == list(gse.gsms)
+    for name in gse.gsms:
+        pd.testing.assert_frame_equal(cached.gsms[name].table, gse.gsms[name].table)
+    pd.testing.assert_frame_equal(cached.gpls["GPL1"].table, gse.gpls["GPL1"].table)
+
+    # Only some tables and columns, with memory-mapped numeric data
+    partial = geodlparse(
+        "GSE1",
+        soft_file.parent,
+        tables=["GSM1"],
+        columns=["ID_REF", "VALUE"],
+        mmap=True,
+    )
+    assert partial.gsms["GSM0"].table.empty
+    assert partial.gsms["GSM0"].metadata == gse.gsms["GSM0"].metadata
+    assert list(partial.gsms["GSM1"].table.columns) == ["ID_REF", "VALUE"]
+    assert isinstance(partial.gsms["GSM1"].table["VALUE"].values, np.memmap)
+
+
+def test_geodlparse_cache_invalidation(soft_file, cachedir):
+    """Test that a changed SOFT file is parsed again instead of loaded."""
+    from infoml.binf.data import geodlparse
+    from infoml.binf.cache import CACHE
+    from conftest import make_soft
+    import gzip
+
+    geodlparse("GSE1", soft_file.parent, cache=True)
+    hits = CACHE.stats["hits"]
+    assert len(geodlparse("GSE1", soft_file.parent, cache=True, memo=False).gsms) == 3
+    assert CACHE.stats["hits"] == hits + 1
+
+    with gzip.open(soft_file, "wt") as f:
+        f.write(make_soft(nsamples=4))
+    assert len(geodlparse("GSE1", soft_file.parent, cache=True).gsms) == 4
+    assert len(list(cachedir.glob("GSE1-*.geocache"))) == 1
+
+
+def test_geodlparse_memo(soft_file, cachedir, monkeypatch):
+    """Test that parsed objects are reused until the SOFT file changes."""
+    import infoml.binf.data as data
+    from conftest import make_soft
+    import gzip
+
+    calls = []
+    get_GEO = data.get_GEO
+    monkeypatch.setattr(data, "get_GEO", lambda **k: calls.append(k) or get_GEO(**k))
+
+    gse = data.geodlparse("GSE1", soft_file.parent)
+    assert data.geodlparse("GSE1", soft_file.parent) is gse
+    assert data.geodlparse("GSE1", soft_file.parent, memo=False) is not gse
+    assert len(calls) == 2
+
+    with gzip.open(soft_file, "wt") as f:
+        f.write(make_soft(nsamples=2))
+    assert len(data.geodlparse("GSE1", soft_file.parent).gsms) == 2
+    assert len(calls) == 3
+
+
+def test_cumida_load(cumida, cachedir, monkeypatch):
+    """Test loading a dataset with GenBank accessions as column names."""
+    import infoml.binf.data as data
+    import pandas as pd
+    import numpy as np
+
+    gpl = pd.DataFrame({"ID": ["p0", "p1", "p2"], "GB_ACC": [np.nan, "NM_1", "NM_1"]})
+    parsed = []
+    monkeypatch.setattr(
+        data,
+        "probeindex",
+        lambda acc, *a, **k: parsed.append(acc) or data.ProbeIndex.from_table(gpl),
+    )
+
+    pd.DataFrame(
+        {
+            "samples": [1, 2],
+            "type": ["normal", "tumor"],
+            "p0": [1.0, 2.0],
+            "p1": [3.0, 4.0],
+            "p2": [5.0, 6.0],
+        }
+    ).to_csv(cumida.gse_dir / "Breast_GSE100.csv", index=False)
+
+    gse = cumida.load(("GSE100", "Breast"))
+    assert list(gse.columns) == ["NM_1.0", "NM_1.1", "p0.0"]
+    assert list(gse["p0.0"]) == [1.0, 2.0]
+    assert parsed == ["GPL570"]
+
+    # The parsed CSV is shared read-only with later loads
+    probes = cumida.load(("GSE100", "Breast"), probe_ids=True)
+    assert list(probes.columns) == ["p0", "p1", "p2"]
+    again = cumida.load(("GSE100", "Breast"), probe_ids=True)
+    assert np.shares_memory(probes.to_numpy(), again.to_numpy())
+    with pytest.raises(ValueError):
+        probes.iloc[0, 1] = -1
+    assert probes.iloc[0, 1] == 3.0
+
+    # Memory-mapped values keep the file's column order
+    values, samples, labels, genes = cumida.load(("GSE100", "Breast"), mmap=True)
+    assert isinstance(values, np.memmap) and values.dtype == np.float32
+    assert not values.flags.writeable
+    assert list(genes) == ["p0.0", "NM_1.0", "NM_1.1"]
+    assert list(samples) == [1, 2] and list(labels) == ["normal", "tumor"]
+    assert values[:, list(genes).index("NM_1.1")].tolist() == [5.0, 6.0]
+
+
+def test_read_cumida(tmp_path, monkeypatch):
+    """Test the binary copy written on the first read of a CuMiDa CSV."""
+    from infoml.binf.data import read_cumida
+    import pandas as pd
+    import numpy as np
+
+    path = tmp_path / "Breast_GSE100.csv"
+    pd.DataFrame(
+        {"samples": [1, 2], "type": ["normal", "tumor"], "a": [1.5, 2.5], "b": [3, 4]}
+    ).to_csv(path, index=False)
+
+    values, samples, labels, genes = read_cumida(path)
+    assert values.dtype == np.float32 and values.flags.f_contiguous
+    assert values.tolist() == [[1.5, 3.0], [2.5, 4.0]]
+    assert samples.tolist() == [1, 2] and labels.tolist() == ["normal", "tumor"]
+    assert genes.tolist() == ["a", "b"]
+    assert path.with_suffix(".npy").is_file() and path.with_suffix(".json").is_file()
+
+    # Later reads use the binary copy
+    with monkeypatch.context() as m:
+        m.setattr(pd, "read_csv", None)
+        again, *_ = read_cumida(path, mmap=True)
+        assert isinstance(again, np.memmap) and not again.flags.writeable
+        assert np.array_equal(again, values)
+
+    # A row-major copy is written on request
+    rows, *_ = read_cumida(path, mmap=True, order="C")
+    assert rows.flags.c_contiguous and np.array_equal(rows, values)
+    assert path.with_suffix(".rows.npy").is_file()
+
+    # The copies are rebuilt when the CSV changes
+    pd.DataFrame({"samples": [3], "type": ["normal"], "a": [7.0]}).to_csv(
+        path, index=False
+    )
+    values, samples, _, genes = read_cumida(path)
+    assert values.tolist() == [[7.0]] and samples.tolist() == [3]
+    assert genes.tolist() == ["a"]
+    rows, *_ = read_cumida(path, order="C")
+    assert rows.tolist() == [[7.0]]
+
+
+def test_readcsv_pyarrow(tmp_path, monkeypatch):
+    """Test that the pyarrow and pandas CSV readers give the same result."""
+    pytest.importorskip("pyarrow")
+    from infoml.binf.data import _readcsv
+    import pandas as pd
+    import numpy as np
+    import sys
+
+    path = tmp_path / "Breast_GSE100.csv"
+    pd.DataFrame(
+        {"samples": [1, 2], "type": ["normal", "tumor"], "a": [1.5, None], "b": [3, 4]}
+    ).to_csv(path, index=False)
+
+    values, info = _readcsv(path)
+    with monkeypatch.context() as m:
+        m.setitem(sys.modules, "pyarrow", None)
+        expected, expected_info = _readcsv(path)
+
+    assert values.dtype == np.float32 and values.flags.f_contiguous
+    assert np.array_equal(values, expected, equal_nan=True)
+    assert np.isnan(values[1, 0]) and values[1, 1] == 4.0
+    assert info == expected_info
+
+
+@pytest.mark.parametrize("shuffle", [False, True])
+def test_cumida_iter_batches(cumida, shuffle):
+    """Test streaming two datasets in mini-batches of samples."""
+    import pandas as pd
+    import numpy as np
+
+    # The second dataset lists its probes in a different order
+    for gse, start, n, columns in [(100, 0, 7, ["a", "b"]), (200, 7, 4, ["b", "a"])]:
+        samples = np.arange(start, start + n)
+        frame = pd.DataFrame(
+            {"samples": samples, "type": np.where(samples % 3, "tumor", "normal")}
+        )
+        frame["a"], frame["b"] = samples * 1.0, -samples * 1.0
+        frame[["samples", "type"] + columns].to_csv(
+            cumida.gse_dir / f"Breast_GSE{gse}.csv", index=False
+        )
+
+    batches = cumida.iter_batches(
+        cumida.index, batch_size=3, shuffle=shuffle, chunk_size=2, seed=0
+    )
+    assert list(batches.classes) == ["normal", "tumor"]
+    assert list(batches.genes) == ["a", "b"] and len(batches) == 4
+
+    seen = []
+    for X, y in batches:
+        assert X.dtype == np.float32 and X.flags.c_contiguous
+        assert len(X) == 3 or len(seen) == 9
+        assert np.array_equal(X[:, 1], -X[:, 0])
+        assert np.array_equal(
+            batches.classes[y], np.where(X[:, 0] % 3, "tumor", "normal")
+        )
+        seen += X[:, 0].tolist()
+
+    assert sorted(seen) == list(range(11))
+    assert (seen == sorted(seen)) != shuffle
+
+
+def test_cumida_iter_batches_memory(cumida):
+    """Test that batch memory does not grow with the dataset."""
+    import tracemalloc
+    import pandas as pd
+    import numpy as np
+
+    genes = [f"p{j}" for j in range(200)]
+    for gse, order in [(100, genes), (200, genes[::-1])]:
+        frame = pd.DataFrame(np.ones((1000, 200), dtype=np.float32), columns=genes)
+        frame.insert(0, "type", "normal")
+        frame.insert(0, "samples", range(1000))
+        frame[["samples", "type"] + order].to_csv(
+            cumida.gse_dir / f"Breast_GSE{gse}.csv", index=False
+        )
+
+    # Each dataset is 800 kB; a chunk of 64 samples is 51 kB
+    batches = cumida.iter_batches(
+        cumida.index, batch_size=16, chunk_size=64, shuffle=True, seed=0
+    )
+    tracemalloc.start()
+    try:
+        count = sum(len(y) for _, y in batches)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    assert count == 2000
+    assert peak < 300_000
+
+    # Samples are read from the row-major copies
+    assert all(x.flags.c_contiguous for x in batches.values)
+
+
+def test_top_variance_memory(tmp_path):
+    """Test that the gene prefilter does not load a memory-mapped matrix."""
+    from infoml.binf.data import top_variance
+    import tracemalloc
+    import numpy as np
+
+    # An 8 MB column-major matrix whose last columns vary the most
+    path = tmp_path / "values.npy"
+    values = np.lib.format.open_memmap(
+        path, mode="w+", dtype=np.float32, shape=(100, 20000), fortran_order=True
+    )
+    rng = np.random.default_rng(0)
+    for start in range(0, 20000, 2000):
+        scale = np.arange(start, start + 2000, dtype=np.float32)
+        values[:, start : start + 2000] = rng.normal(size=(100, 2000)) * scale
+    del values
+
+    values = np.load(path, mmap_mode="r")
+    tracemalloc.start()
+    try:
+        selected = top_variance(values, 100, block_size=2**18)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    assert peak < 1_000_000
+
+    expected = np.argsort(np.asarray(values).var(axis=0, ddof=1))[-100:]
+    assert np.array_equal(selected, np.sort(expected))
+
+
+def test_top_variance(cumida, cachedir):
+    """Test the streaming column statistics and the top-k gene prefilter."""
+    from infoml.binf.data import column_stats, top_variance
+    import pandas as pd
+    import numpy as np
+
+    rng = np.random.default_rng(0)
+    values = rng.normal(size=(11, 6)) * np.arange(1, 7)
+    mean, var = column_stats(values.astype(np.float32), block_size=200)
+    assert np.allclose(mean, values.mean(axis=0), atol=1e-5)
+    assert np.allclose(var, values.var(axis=0, ddof=1), rtol=1e-5)
+
+    values[:, 4] = np.nan
+    assert list(top_variance(values, 2, block_size=1)) == [3, 5]
+    assert list(top_variance(values, 10)) == list(range(6))
+
+    frame = pd.DataFrame(values, columns=[f"p{j}" for j in range(6)])
+    frame.insert(0, "type", "normal")
+    frame.insert(0, "samples", range(11))
+    frame.to_csv(cumida.gse_dir / "Breast_GSE100.csv", index=False)
+
+    gse = cumida.load(("GSE100", "Breast"), probe_ids=True, top_genes=3)
+    assert list(gse.columns) == ["p2", "p3", "p5"]
+    assert np.allclose(gse["p5"], values[:, 5], rtol=1e-6)
+    assert gse.shape == (11, 3) and gse.dtypes.eq(np.float32).all()
+    full = cumida.load(("GSE100", "Breast"), probe_ids=True)
+    assert full.shape == (11, 6)
+
+    X, *_, genes = cumida.load(
+        ("GSE100", "Breast"), probe_ids=True, mmap=True, top_genes=1
+    )
+    assert list(genes) == ["p5"] and X.shape == (11, 1)
+
+
+@pytest.mark.parametrize("method", ["mean", "max", "median", "maxvar"])
+def test_cumida_collapse(cumida, cachedir, monkeypatch, method):
+    """Test collapsing the probes of each GenBank accession."""
+    import infoml.binf.data as data
+    import pandas as pd
+    import numpy as np
+
+    gpl = pd.DataFrame(
+        {
+            "ID": ["p0", "p1", "p2", "p3", "p4"],
+            "GB_ACC": [np.nan, "NM_1", "NM_1", "NM_2", "NM_1"],
+        }
+    )
+    built = []
+    monkeypatch.setattr(
+        data,
+        "probeindex",
+        lambda acc, *a, **k: built.append(acc) or data.ProbeIndex.from_table(gpl),
+    )
+
+    rng = np.random.default_rng(0)
+    values = rng.normal(size=(6, 5)).astype(np.float32) * [1, 1, 3, 1, 2]
+    frame = pd.DataFrame(values, columns=gpl["ID"])
+    frame.insert(0, "type", "normal")
+    frame.insert(0, "samples", range(6))
+    frame.to_csv(cumida.gse_dir / "Breast_GSE100.csv", index=False)
+
+    # The result matches a groupby over the accessions
+    genes = gpl["GB_ACC"].fillna(gpl["ID"])
+    if method == "maxvar":
+        expected = frame[["p3", "p2", "p0"]].set_axis(["NM_2", "NM_1", "p0"], axis=1)
+    else:
+        expected = frame[gpl["ID"]].T.groupby(genes.to_numpy()).agg(method).T
+    expected = expected[["NM_1", "NM_2", "p0"]]
+
+    gse = cumida.load(("GSE100", "Breast"), collapse=method)
+    assert list(gse.columns) == ["NM_1", "NM_2", "p0"]
+    assert gse.index.names == ["samples", "type"]
+    assert np.allclose(gse.to_numpy(), expected.to_numpy(), atol=1e-6)
+
+    # The aggregation matrix is built once and reused for memory-mapped loads
+    X, *_, names = cumida.load(("GSE100", "Breast"), mmap=True, collapse=method)
+    assert list(names) == ["NM_1", "NM_2", "p0"]
+    assert np.allclose(X, expected.to_numpy(), atol=1e-6)
+    assert built == ["GPL570"] and len(cumida._collapse) == 1
+
+
+def test_iter_soft(soft_file):
+    """Test streaming the samples of a SOFT file."""
+    from infoml.binf.data import iter_soft
+    from GEOparse import get_GEO
+    import pandas as pd
+
+    gse = get_GEO(filepath=str(soft_file), silent=True)
+    gsms = list(iter_soft(soft_file))
+    assert [gsm.name for gsm in gsms] == list(gse.gsms)
+    for gsm in gsms:
+        assert gsm.metadata == gse.gsms[gsm.name].metadata
+        pd.testing.assert_frame_equal(gsm.table, gse.gsms[gsm.name].table)
+
+    batches = list(iter_soft(soft_file, batch_size=2))
+    assert [[gsm.name for gsm in batch] for batch in batches] == [
+        ["GSM0", "GSM1"],
+        ["GSM2"],
+    ]
+
+    (gsm,) = iter_soft(soft_file, samples=["GSM1"], columns=["ID_REF", "VALUE"])
+    assert gsm.name == "GSM1"
+    assert list(gsm.table.columns) == ["ID_REF", "VALUE"]
+    assert list(gsm.columns.index) == ["ID_REF", "VALUE"]
+
+
+def test_geodlparse_lazy(soft_file, cachedir):
+    """Test that lazy GSEs only parse sample tables on access."""
+    from infoml.binf.data import geodlparse, LazyGSM
+    from GEOparse import get_GEO
+    import pandas as pd
+
+    gse = get_GEO(filepath=str(soft_file), silent=True)
+    lazy = geodlparse("GSE1", soft_file.parent, lazy=True)
+
+    assert lazy.metadata == gse.metadata
+    assert lazy.database.metadata == gse.database.metadata
+    pd.testing.assert_frame_equal(lazy.gpls["GPL1"].table, gse.gpls["GPL1"].table)
+    assert all(
+        isinstance(gsm, LazyGSM) and not gsm.loaded for gsm in lazy.gsms.values()
+    )
+    assert lazy.gsms["GSM2"].metadata == gse.gsms["GSM2"].metadata
+
+    pd.testing.assert_frame_equal(lazy.gsms["GSM2"].table, gse.gsms["GSM2"].table)
+    assert lazy.gsms["GSM2"].loaded and not lazy.gsms["GSM0"].loaded
+
+
+def test_parsejob_config(soft_file, cachedir, monkeypatch):
+    """Test that batch workers restore the configuration of the parent."""
+    import infoml.binf.data as data
+    from infoml import CONFIG
+
+    old = data._configstate()
+    assert old["cache"] == cachedir
+    config = {**old, "ttl": 5.0, "cachesize": 2**20, "memsize": 0, "chunksize": 8}
+    monkeypatch.setattr(
+        data, "geodlparse", lambda *a, **k: data._configstate() == config
+    )
+    try:
+        assert data._parsejob("GSE1", soft_file.parent, {}, config, False)
+    finally:
+        for name, value in old.items():
+            getattr(CONFIG, name)(value)
+
+
+def test_parsegse_workers(soft_file, monkeypatch):
+    """Test parsing sample tables in worker processes that are not forked."""
+    import infoml.binf.data as data
+    from GEOparse import get_GEO
+    import pandas as pd
+
+    methods = []
+    context = data._mpcontext
+    monkeypatch.setattr(
+        data, "_mpcontext", lambda: methods.append(context()) or methods[-1]
+    )
+
+    gse = get_GEO(filepath=str(soft_file), silent=True)
+    parsed = data.parsegse(soft_file, workers=2)
+    assert [m.get_start_method() for m in methods] in (["forkserver"], ["spawn"])
+    assert list(parsed.gsms) == list(gse.gsms)
+    for name, gsm in parsed.gsms.items():
+        pd.testing.assert_frame_equal(gsm.table, gse.gsms[name].table)
+
+
+def test_softfile_checkpoints(tmp_path):
+    """Test reading byte ranges of a gzipped file from checkpoints."""
+    from infoml.binf.data import _SoftFile, _scan_soft
+    from conftest import make_soft
+    import gzip
+
+    text = make_soft(nsamples=20, nprobes=500).encode()
+    with gzip.open(tmp_path / "GSE1_family.soft.gz", "wb") as f:
+        f.write(text)
+
+    soft = _SoftFile(tmp_path / "GSE1_family.soft.gz", spacing=1)
+    soft.BLOCK = 1024
+    sections = list(_scan_soft(soft))
+    assert [s[1] for s in sections[3:]] == [f"GSM{i}" for i in range(20)]
+    assert len(soft._checkpoints) > 10
+
+    for start, end in [(0, 10), (5000, 60000), (len(text) - 100, len(text))]:
+        assert soft.read(start, end) == text[start:end]
+    start, end = sections[-1][3]
+    assert text[start:end].startswith(b"ID_REF\tVALUE")
+    assert text[end:].startswith(b"!sample_table_end")
+
+
+def test_geodlparse_workers(tmp_path, cachedir, monkeypatch):
+    """Test that the parallel parse matches the serial parse."""
+    from infoml.binf.data import geodlparse
+    import infoml.binf.data as data
+    from conftest import make_soft
+    import pandas as pd
+    import gzip
+
+    with gzip.open(tmp_path / "GSE1_family.soft.gz", "wt") as f:
+        f.write(make_soft(nsamples=12, nprobes=50))
+
+    serial = geodlparse("GSE1", tmp_path, memo=False)
+    monkeypatch.setattr(data, "get_GEO", None)
+    parallel = geodlparse("GSE1", tmp_path, memo=False, workers=3)
+
+    assert parallel.name == serial.name
+    assert parallel.metadata == serial.metadata
+    assert parallel.database.metadata == serial.database.metadata
+    assert list(parallel.gsms) == list(serial.gsms)
+    for name, gsm in serial.gsms.items():
+        assert parallel.gsms[name].metadata == gsm.metadata
+        pd.testing.assert_frame_equal(parallel.gsms[name].columns, gsm.columns)
+        pd.testing.assert_frame_equal(parallel.gsms[name].table, gsm.table)
+    pd.testing.assert_frame_equal(
+        parallel.gpls["GPL1"].table, serial.gpls["GPL1"].table
+    )
+    assert parallel.gpls["GPL1"].metadata == serial.gpls["GPL1"].metadata
+
+
+def test_expression_matrix(soft_file, tmp_path):
+    """Test aligning sample values on the platform probes."""
+    from infoml.binf.data import expression_matrix
+    from GEOparse import get_GEO
+    import numpy as np
+
+    gse = get_GEO(filepath=str(soft_file), silent=True)
+    gse.gsms["GSM2"].table = gse.gsms["GSM2"].table.iloc[1:]
+
+    X, probes, samples = expression_matrix(gse)
+    assert X.dtype == np.float32 and X.shape == (3, 5)
+    assert list(probes) == [f"p{j}" for j in range(5)]
+    assert list(samples) == ["GSM0", "GSM1", "GSM2"]
+
+    expected = np.array([[i * 10 + j + 0.5 for j in range(5)] for i in range(3)])
+    expected[2, 0] = np.nan
+    np.testing.assert_array_equal(X, expected.astype(np.float32))
+
+    out = tmp_path / "matrix.npy"
+    X, _, _ = expression_matrix(gse, dtype=np.float64, out=out)
+    assert isinstance(X, np.memmap)
+    np.testing.assert_array_equal(np.load(out), expected)
+
+
+def test_probeindex(tmp_path, cachedir, monkeypatch):
+    """Test building, sharing and querying a platform's probe index."""
+    import infoml.binf.data as data
+    from conftest import make_soft
+    import numpy as np
+
+    text = make_soft(nprobes=7)
+    platform = text[text.index("^PLATFORM") : text.index("^SAMPLE")]
+    (tmp_path / "GPL1.txt").write_text(platform)
+
+    parsed = []
+    geodlparse = data.geodlparse
+    monkeypatch.setattr(
+        data, "geodlparse", lambda *a, **k: parsed.append(k) or geodlparse(*a, **k)
+    )
+
+    index = data.probeindex("GPL1", tmp_path)
+    assert len(index) == 7 and list(index.ids) == sorted(f"p{j}" for j in range(7))
+    assert isinstance(index.ids, np.memmap)
+    assert "SEQUENCE" not in parsed[0]["columns"]
+
+    probes = ["p4", "p0", "missing", "p5"]
+    assert list(index.lookup(probes)) == ["NM_2", "", "", "NM_2"]
+    assert list(index.lookup(probes, "symbol")) == ["G2", "G0", "", "G2"]
+    assert list(index.lookup(probes, "entrez")) == ["102", "100", "", "102"]
+
+    # Later calls reuse the saved index
+    assert list(data.probeindex("GPL1", tmp_path).ids) == list(index.ids)
+    assert len(parsed) == 1
+
+
+def test_geodlparse_column_projection(soft_file, cachedir, monkeypatch):
+    """Test that projected parses match the full parse."""
+    import infoml.binf.data as data
+    from conftest import make_soft
+    from GEOparse import get_GEO
+    import pandas as pd
+
+    full = get_GEO(filepath=str(soft_file), silent=True)
+    text = make_soft()
+    (soft_file.parent / "GPL1.txt").write_text(
+        text[: text.index("^SERIES")]
+        + text[text.index("^PLATFORM") : text.index("^SAMPLE")]
+    )
+    monkeypatch.setattr(data, "get_GEO", None)
+
+    gpl = data.geodlparse("GPL1", soft_file.parent, columns=["ID", "GB_ACC"])
+    expected = full.gpls["GPL1"].table[["ID", "GB_ACC"]]
+    pd.testing.assert_frame_equal(gpl.table, expected)
+    assert list(gpl.columns.index) == ["ID", "GB_ACC"]
+    assert gpl.metadata == full.gpls["GPL1"].metadata
+    assert gpl.database.metadata == full.database.metadata
+
+    gse = data.geodlparse("GSE1", soft_file.parent, columns=["ID", "VALUE"])
+    assert gse.metadata == full.metadata
+    pd.testing.assert_frame_equal(
+        gse.gpls["GPL1"].table, full.gpls["GPL1"].table[["ID"]]
+    )
+    for name, gsm in full.gsms.items():
+        assert gse.gsms[name].metadata == gsm.metadata
+        pd.testing.assert_frame_equal(gse.gsms[name].table, gsm.table[["VALUE"]])
+
+
+@pytest.mark.parametrize("cache", [False, True])
+def test_geodlparse_batch(soft_file, cachedir, monkeypatch, cache):
+    """Test that batches stream results and capture errors per accession."""
+    import infoml.binf.data as data
+
+    def fake_downloadurl(url, file, progress=True):
+        raise ConnectionError("connection reset")
+
+    # Workers must not be forked while the download threads run
+    contexts = []
+    executor = data.ProcessPoolExecutor
+
+    def pool(*args, mp_context=None, **kwargs):
+        contexts.append(mp_context.get_start_method())
+        return executor(*args, mp_context=mp_context, **kwargs)
+
+    monkeypatch.setattr(data, "ProcessPoolExecutor", pool)
+    monkeypatch.setattr(data, "downloadurl", fake_downloadurl)
+    truncated = soft_file.read_bytes()[: soft_file.stat().st_size // 2]
+    (soft_file.parent / "GSE3_family.soft.gz").write_bytes(truncated)
+
+    results = dict(
+        data.geodlparse_batch(
+            ["GSE1", "GSE2", "GSE3"], soft_file.parent, workers=2, cache=cache
+        )
+    )
+
+    assert sorted(results) == ["GSE1", "GSE2", "GSE3"]
+    assert list(results["GSE1"].gsms) == ["GSM0", "GSM1", "GSM2"]
+    assert isinstance(results["GSE2"], ConnectionError)
+    assert isinstance(results["GSE3"], EOFError)
+    assert contexts and "fork" not in contexts
+    if cache:
+        assert len(list(cachedir.glob("GSE1-*.geocache"))) == 1
@@ -0,0 +1,117 @@
+"""
+Tests for the `infoml.binf.normalize` module.
+"""
+
+import pytest
+
+
+@pytest.fixture
+def values():
+    """A random positive float32 matrix of 9 samples and 5 genes."""
+    import numpy as np
+
+    rng = np.random.default_rng(0)
+    return rng.gamma(2.0, 100.0, size=(9, 5)).astype(np.float32)
+
+
+def test_log2(values):
+    """Test the chunked log2 transform, in place and into a new array."""
+    from infoml.binf.normalize import log2
+    import numpy as np
+
+    expected = np.log2(values + 1)
+    out = log2(values, chunk_size=2)
+    assert out is not values and out.dtype == np.float32
+    assert np.allclose(out, expected)
+
+    same = log2(values, out=values, chunk_size=4)
+    assert same is values and np.allclose(values, expected)
+
+
+def test_output_dtype(values):
+    """Test that integer outputs are rejected instead of truncating results."""
+    from infoml.binf import normalize as norm
+    import numpy as np
+
+    counts = np.zeros(values.shape, dtype=np.int64)
+    for step in (norm.log2, norm.quantile_normalize, norm.zscore, norm.normalize):
+        with pytest.raises(AssertionError, match="floating point"):
+            step(values, out=counts)
+    assert not counts.any()
+
+    # Integer inputs are written to a new float array
+    assert norm.log2(counts).dtype == np.float64
+
+
+def test_quantile_normalize(values):
+    """Test that quantile normalized samples share one distribution."""
+    from infoml.binf.normalize import quantile_normalize
+    import numpy as np
+
+    out = quantile_normalize(values, chunk_size=2)
+    reference = np.sort(values, axis=1).mean(axis=0)
+    assert np.allclose(np.sort(out, axis=1), reference)
+    assert (np.argsort(out, axis=1) == np.argsort(values, axis=1)).all()
+
+
+def test_missing_values(values):
+    """Test that missing values stay missing and do not spread."""
+    from infoml.binf.normalize import quantile_normalize, zscore
+    from infoml.binf.data import column_stats
+    import numpy as np
+
+    x = np.array([[1, 2, 3], [4, np.nan, 6], [7, 8, 9]])
+    expected = [[4, 5, 6], [4, np.nan, 6], [4, 5, 6]]
+    assert np.allclose(quantile_normalize(x), expected, equal_nan=True)
+
+    # Rows with missing values keep their ranks among the valid values
+    values[1, [0, 3]] = np.nan
+    values[4, :] = np.nan
+    out = quantile_normalize(values, chunk_size=2)
+    assert np.array_equal(np.isnan(out), np.isnan(values))
+    full = np.delete(out, [1, 4], axis=0)
+    assert np.allclose(np.sort(full, axis=1), np.sort(full[0]))
+    valid = ~np.isnan(values[1])
+    assert np.array_equal(np.argsort(out[1, valid]), np.argsort(values[1, valid]))
+
+    # Statistics ignore missing values
+    mean, var = column_stats(values)
+    assert np.allclose(mean, np.nanmean(values, axis=0))
+    assert np.allclose(var, np.nanvar(values, axis=0, ddof=1))
+    z = zscore(values, chunk_size=3)
+    assert np.array_equal(np.isnan(z), np.isnan(values))
+    expected = (values - np.nanmean(values, axis=0)) / np.nanstd(values, axis=0, ddof=1)
+    assert np.allclose(z, expected, atol=1e-5, equal_nan=True)
+
+
+def test_zscore_memmap(values, tmp_path):
+    """Test z-scoring a read-only memory-mapped matrix into a memmap."""
+    from infoml.binf.normalize import zscore
+    import numpy as np
+
+    np.save(tmp_path / "x.npy", values)
+    source = np.load(tmp_path / "x.npy", mmap_mode="r")
+    out = np.lib.format.open_memmap(
+        tmp_path / "z.npy", mode="w+", dtype=np.float32, shape=values.shape
+    )
+
+    zscore(source, out=out, chunk_size=4)
+    expected = (values - values.mean(axis=0)) / values.std(axis=0, ddof=1)
+    assert np.allclose(out, expected, atol=1e-5)
+
+    # Constant genes are only centered
+    values[:, 0] = 3.0
+    assert np.allclose(zscore(values)[:, 0], 0.0)
+
+
+def test_normalize(values):
+    """Test running all the steps in place."""
+    from infoml.binf import normalize as norm
+    import numpy as np
+
+    expected = norm.zscore(norm.quantile_normalize(norm.log2(values)))
+    out = norm.normalize(values, out=values, chunk_size=3)
+    assert out is values and np.allclose(values, expected, atol=1e-5)
+
+    copy = norm.normalize(values, log=False, quantile=False, scale=False)
+    assert copy is not values and np.array_equal(copy, values)
@@ -48,3 +48,248 @@ def test_slugify():
 
 
 # TODO: Write tests for the `infoml.utils.SQLite` class
+
+
+def test_downloadurl_resume(httpserver, tmp_path, monkeypatch):
+    """Test that `downloadurl` resumes an interrupted transfer."""
+    from infoml.utils import downloadurl, TRANSPORT
+
+    monkeypatch.setattr(TRANSPORT, "retries", 0)
+    monkeypatch.setattr(TRANSPORT, "chunksize", lambda size=0: 1024)
+
+    body = bytes(range(256)) * 64
+    httpserver.files["/GSE1_family.soft.gz"] = body
+    httpserver.cut["/GSE1_family.soft.gz"] = 5000
+    url = httpserver.url("/GSE1_family.soft.gz")
+
+    with pytest.raises(Exception):
+        downloadurl(url, tmp_path, progress=False)
+    assert not (tmp_path / "gse1_family.soft.gz").exists()
+    received = (tmp_path / "gse1_family.soft.gz.part").stat().st_size
+    assert 0 < received <= 5000
+
+    file = downloadurl(url, tmp_path, progress=False)
+    assert file.read_bytes() == body
+    assert not (tmp_path / "gse1_family.soft.gz.part").exists()
+    assert httpserver.requests[-1][1]["Range"] == f"bytes={received}-"
+
+
+def test_downloadurl_restart_on_change(httpserver, tmp_path, monkeypatch):
+    """Test that `downloadurl` restarts if the remote file changed."""
+    from infoml.utils import downloadurl, TRANSPORT
+
+    monkeypatch.setattr(TRANSPORT, "retries", 0)
+
+    httpserver.files["/data.csv"] = b"a" * 4000
+    httpserver.cut["/data.csv"] = 1000
+    url = httpserver.url("/data.csv")
+
+    with pytest.raises(Exception):
+        downloadurl(url, tmp_path, progress=False)
+
+    httpserver.files["/data.csv"] = b"b" * 3000
+    file = downloadurl(url, tmp_path, progress=False)
+    assert file.read_bytes() == b"b" * 3000
+
+
+def test_downloadurl_retries(httpserver, tmp_path, monkeypatch):
+    """Test that `downloadurl` retries server errors and dropped transfers."""
+    from infoml.utils import downloadurl, TRANSPORT
+
+    monkeypatch.setattr(TRANSPORT, "backoff", 0)
+    monkeypatch.setattr(TRANSPORT, "chunksize", lambda size=0: 1024)
+    httpserver.files["/GPL570.txt"] = b"ID\tGB_ACC\n" * 1000
+    httpserver.status["/GPL570.txt"] = [503]
+    httpserver.cut["/GPL570.txt"] = 3000
+    url = httpserver.url("/GPL570.txt")
+
+    file = downloadurl(url, tmp_path, progress=False)
+    assert file.read_bytes() == httpserver.files["/GPL570.txt"]
+    assert "Range" in httpserver.requests[-1][1]
+    assert TRANSPORT.session(url) is TRANSPORT.session(url + "?acc=1")
+
+
+def test_transport_chunksize():
+    """Test the chunk sizes chosen by `Transport.chunksize`."""
+    from infoml.utils import TRANSPORT
+    from infoml import CONFIG
+
+    assert TRANSPORT.chunksize(0) == 64 * 1024
+    assert TRANSPORT.chunksize(10**12) == 4 * 1024 * 1024
+
+    CONFIG.chunksize(1024)
+    try:
+        assert TRANSPORT.chunksize(10**9) == 1024
+    finally:
+        CONFIG.chunksize(0)
+
+
+def test_downloadurl_revalidate(httpserver, tmp_path):
+    """Test that stale files are revalidated with conditional requests."""
+    from infoml.utils import downloadurl
+
+    httpserver.files["/cumida.json"] = b'[{"gse": 1}]'
+    url = httpserver.url("/cumida.json")
+    file = downloadurl(url, tmp_path, progress=False)
+
+    # Fresh files are returned without a request
+    downloadurl(url, tmp_path, progress=False, ttl=3600)
+    assert len(httpserver.requests) == 1
+
+    # Stale files that have not changed are kept
+    downloadurl(url, tmp_path, progress=False, ttl=0)
+    assert len(httpserver.requests) == 2
+    assert "If-None-Match" in httpserver.requests[-1][1]
+
+    # Stale files that have changed are replaced
+    httpserver.files["/cumida.json"] = b'[{"gse": 2}]'
+    downloadurl(url, tmp_path, progress=False, ttl=0)
+    assert file.read_bytes() == b'[{"gse": 2}]'
+
+
+def test_downloadurl_revalidate_error(httpserver, tmp_path, monkeypatch):
+    """Test that stale files are kept when the server cannot revalidate them."""
+    from infoml.utils import downloadurl, TRANSPORT
+
+    monkeypatch.setattr(TRANSPORT, "backoff", 0)
+    httpserver.files["/cumida.json"] = b'[{"gse": 1}]'
+    url = httpserver.url("/cumida.json")
+    file = downloadurl(url, tmp_path, progress=False)
+
+    for status in (503, 404):
+        httpserver.status["/cumida.json"] = [status] * (TRANSPORT.retries + 1)
+        assert downloadurl(url, tmp_path, progress=False, ttl=0) == file
+        assert file.read_bytes() == b'[{"gse": 1}]'
+        assert httpserver.requests[-1][1].get("If-None-Match")
+
+    # Files that were never downloaded still fail
+    httpserver.status["/other.json"] = [503] * (TRANSPORT.retries + 1)
+    with pytest.raises(ConnectionError):
+        downloadurl(httpserver.url("/other.json"), tmp_path, progress=False)
+
+
+def test_downloadurls_async(httpserver, tmp_path, monkeypatch):
+    """Test the asynchronous batch download."""
+    pytest.importorskip("aiohttp")
+    from infoml.utils import downloadurls_async, TRANSPORT
+    import asyncio
+
+    monkeypatch.setattr(TRANSPORT, "backoff", 0)
+    monkeypatch.setattr(TRANSPORT, "chunksize", lambda size=0: 1024)
+    for i in range(3):
+        httpserver.files[f"/Breast_GSE{i}.csv"] = bytes([i]) * 5000
+    httpserver.cut["/Breast_GSE1.csv"] = 2048
+    urls = [httpserver.url(f"/Breast_GSE{i}.csv") for i in range(3)]
+    urls.append(httpserver.url("/missing.csv"))
+
+    files = asyncio.run(
+        downloadurls_async(
+            urls, tmp_path, progress=False, max_per_host=2, return_exceptions=True
+        )
+    )
+    assert [f.name for f in files[:3]] == [f"breast_gse{i}.csv" for i in range(3)]
+    assert files[1].read_bytes() == bytes([1]) * 5000
+    assert isinstance(files[3], FileNotFoundError)
+
+    # Cached files are revalidated like `downloadurl` does
+    n = len(httpserver.requests)
+    asyncio.run(downloadurls_async(urls[:3], tmp_path, progress=False, ttl=0))
+    assert len(httpserver.requests) == n + 3
+    assert all("If-None-Match" in h for _, h in httpserver.requests[n:])
+
+
+@pytest.mark.parametrize("ranges", [True, False])
+def test_downloadurl_segmented(httpserver, tmp_path, monkeypatch, ranges):
+    """Test segmented downloads and their single stream fallback."""
+    from infoml.utils import downloadurl, TRANSPORT
+
+    monkeypatch.setattr(TRANSPORT, "min_segment", 4096)
+    httpserver.ranges = ranges
+    body = bytes(range(256)) * 160
+    httpserver.files["/GSE2_family.soft.gz"] = body
+    url = httpserver.url("/GSE2_family.soft.gz")
+
+    file = downloadurl(url, tmp_path, progress=False, segments=4)
+    assert file.read_bytes() == body
+    assert not (tmp_path / "gse2_family.soft.gz.part.json").exists()
+
+    ranges = [h.get("Range") for _, h in httpserver.requests]
+    if httpserver.ranges:
+        assert sorted(ranges[1:]) == [
+            "bytes=0-10239",
+            "bytes=10240-20479",
+            "bytes=20480-30719",
+            "bytes=30720-40959",
+        ]
+    else:
+        assert ranges == ["bytes=0-0", None]
+
+
+def test_downloadurl_transforms(httpserver, tmp_path, monkeypatch):
+    """Test hashing and decompressing a download in one pass."""
+    from infoml.utils import downloadurl, Checksum, Gunzip, TRANSPORT
+    import hashlib, gzip
+
+    monkeypatch.setattr(TRANSPORT, "retries", 0)
+    monkeypatch.setattr(TRANSPORT, "chunksize", lambda size=0: 1024)
+    text = b"".join(b"ID_REF\tVALUE\n%d\t%d\n" % (i, i) for i in range(2000))
+    body = gzip.compress(text[:9000]) + gzip.compress(text[9000:])
+    digest = hashlib.sha256(body).hexdigest()
+    httpserver.files["/GSE3_family.soft.gz"] = body
+    httpserver.cut["/GSE3_family.soft.gz"] = len(body) // 2
+    url = httpserver.url("/GSE3_family.soft.gz")
+
+    # Resumed transfers feed the partial file to the transforms first
+    checksum = Checksum("sha256", digest)
+    gunzip = Gunzip(tmp_path / "GSE3_family.soft")
+    with pytest.raises(Exception):
+        downloadurl(url, tmp_path, progress=False, transforms=[checksum, gunzip])
+    downloadurl(url, tmp_path, progress=False, transforms=[checksum, gunzip])
+    assert checksum.hexdigest == digest
+    assert gunzip.dest.read_bytes() == text
+
+    # Cached files are checked against the stored digest
+    with pytest.raises(ValueError):
+        downloadurl(url, tmp_path, progress=False, transforms=[Checksum("md5", "0")])
+    with pytest.raises(ValueError):
+        downloadurl(url, tmp_path, progress=False, transforms=[Checksum(expected="0")])
+
+    # Rejected downloads are discarded
+    httpserver.files["/other.gz"] = body
+    with pytest.raises(ValueError):
+        downloadurl(
+            httpserver.url("/other.gz"),
+            tmp_path,
+            progress=False,
+            transforms=[Checksum(expected="0")],
+        )
+    assert not (tmp_path / "other.gz").exists()
+
+
+def test_filelock(tmp_path):
+    """Test that `FileLock` excludes other holders."""
+    from infoml.utils import FileLock
+
+    with FileLock(tmp_path / "GPL570.lock") as lock:
+        assert lock.locked
+        assert not FileLock(tmp_path / "GPL570.lock").acquire(blocking=False)
+        with pytest.raises(TimeoutError):
+            FileLock(tmp_path / "GPL570.lock", timeout=0.2).acquire()
+    assert not lock.locked
+    assert FileLock(tmp_path / "GPL570.lock").acquire(blocking=False)
+
+
+def test_downloadurl_single_flight(httpserver, tmp_path):
+    """Test that concurrent calls for one file download it once."""
+    from infoml.utils import downloadurl
+    from concurrent.futures import ThreadPoolExecutor
+
+    httpserver.files["/GPL96.txt"] = b"ID\tGB_ACC\n" * 10000
+    url = httpserver.url("/GPL96.txt")
+
+    with ThreadPoolExecutor(8) as pool:
+        files = list(
+            pool.map(lambda _: downloadurl(url, tmp_path, False, False), range(8))
+        )
+    assert len(set(files)) == 1
+    assert len(httpserver.requests) == 1